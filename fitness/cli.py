@@ -0,0 +1,81 @@
+"""
+Command-line plumbing shared by the fitness scripts: reading & writing
+records (lists of same-keyed dicts) as CSV or JSON, printing them as aligned
+tables, validating duration arguments, & importing NumPy only for the
+features that need it.
+
+Usage:
+    from cli import duration_arg, print_records, read_records, require_numpy
+
+    parser.add_argument("time", type=duration_arg)
+    records = read_records(Path("team.csv"))
+    print_records(records)
+    np = require_numpy("--batch")
+"""
+
+import argparse
+import csv
+import json
+import sys
+
+from durations import parse_duration
+
+
+BOLD = "\033[1m"
+END = "\033[0m"
+
+
+def duration_arg(value):
+    """argparse type for a duration ("H:MM:SS" or "MM:SS"), checked with
+    `durations.parse_duration()` & returned as given."""
+    try:
+        parse_duration(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    return value
+
+
+def require_numpy(feature):
+    """Import NumPy on first use by `feature` (e.g. "--batch"), so the rest
+    of a script works without it. Exits with an error if it's missing."""
+    try:
+        import numpy
+    except ImportError:
+        print(f"Error: {feature} needs NumPy: `pip install numpy`")
+        sys.exit(1)
+    return numpy
+
+
+def read_records(path):
+    """Read a list of dicts from a .json file (a list of objects), or else
+    from CSV with a header row."""
+    if path.suffix.lower() == ".json":
+        return json.loads(path.read_text())
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def print_records(records):
+    """Print a list of same-keyed dicts as an aligned table, with the header
+    row in bold on a terminal."""
+    bold, end = (BOLD, END) if sys.stdout.isatty() else ("", "")
+    columns = list(records[0])
+    table = [columns] + [
+        ["" if record[c] is None else str(record[c]) for c in columns]
+        for record in records
+    ]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    for n, line in enumerate(table):
+        text = "  ".join(value.ljust(w) for value, w in zip(line, widths))
+        print(f"{bold}{text.rstrip()}{end}" if n == 0 else text.rstrip())
+
+
+def write_records(records, path):
+    """Write a list of same-keyed dicts to a .json file, or else as CSV."""
+    if path.suffix.lower() == ".json":
+        path.write_text(json.dumps(records, indent=2) + "\n")
+    else:
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
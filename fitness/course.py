@@ -0,0 +1,118 @@
+"""
+Streaming GPX/TCX course reader, for precise_race_splits.py & friends. FIT
+activity files are read with fit.py.
+
+Track points are read with `xml.etree.ElementTree.iterparse()`, & each point
+is dropped from the tree as soon as it's read, so even a multi-hour track
+takes only 24 bytes per point (latitude, longitude & elevation) rather than a
+whole DOM.
+
+Usage:
+    from course import cumulative_distance, read_track
+
+    lat, lon, ele = read_track("marathon.gpx")
+    meters = cumulative_distance(lat, lon)
+
+Dependencies: `pip install numpy`
+"""
+
+from array import array
+import functools
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+# Mean Earth radius (IUGG), in meters
+EARTH_RADIUS_M = 6_371_008.8
+
+# GPX track/route points & TCX trackpoints
+POINT_TAGS = {"trkpt", "rtept", "Trackpoint"}
+
+
+@functools.cache
+def _local(tag):
+    """Tag without its {namespace}. Cached, as a track repeats a few tags
+    millions of times."""
+    return tag.rpartition("}")[2]
+
+
+def _point(elem):
+    """Return (lat, lon, ele) of a GPX or TCX point element, with NaN for a
+    missing elevation, or None if it has no position."""
+    lat = elem.get("lat")
+    lon = elem.get("lon")
+    ele = None
+    for child in elem.iter():
+        name = _local(child.tag)
+        if name == "LatitudeDegrees":
+            lat = child.text
+        elif name == "LongitudeDegrees":
+            lon = child.text
+        elif name in ("ele", "AltitudeMeters"):
+            ele = child.text
+    if lat is None or lon is None:
+        return None
+    return float(lat), float(lon), float(ele) if ele else float("nan")
+
+
+def _fit_track(path):
+    """(lat, lon, ele) arrays of the records with a position in a .fit file."""
+    from fit import read_fit
+
+    record = read_fit(path).get("record", {})
+    lat = record.get("position_lat")
+    lon = record.get("position_long")
+    if lat is None or lon is None:
+        return np.empty(0), np.empty(0), np.empty(0)
+    ele = record.get("enhanced_altitude", record.get("altitude"))
+    if ele is None:
+        ele = np.full(len(lat), np.nan)
+    known = ~(np.isnan(lat) | np.isnan(lon))
+    return lat[known], lon[known], ele[known]
+
+
+def read_track(path):
+    """Read every point of a .gpx, .tcx, or .fit file, in order.
+
+    Returns (latitudes, longitudes, elevations) as NumPy arrays, with NaN
+    elevations where a point has none. Points without a position (e.g. TCX
+    pauses) are skipped. Raises ValueError on malformed XML or bad numbers.
+    """
+    if str(path).lower().endswith(".fit"):
+        return _fit_track(path)
+    lats, lons, eles = array("d"), array("d"), array("d")
+    # Open elements, so a finished point can be removed from its parent
+    open_elems = []
+    try:
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                open_elems.append(elem)
+                continue
+            open_elems.pop()
+            if _local(elem.tag) not in POINT_TAGS:
+                continue
+            point = _point(elem)
+            if point is not None:
+                lats.append(point[0])
+                lons.append(point[1])
+                eles.append(point[2])
+            # The point just ended, so it's its parent's last child
+            if open_elems:
+                del open_elems[-1][-1]
+    except ET.ParseError as e:
+        raise ValueError(f"{path}: {e}") from None
+    return np.frombuffer(lats), np.frombuffer(lons), np.frombuffer(eles)
+
+
+def cumulative_distance(lat, lon):
+    """Distance in meters from the first point to each point along a track,
+    using the haversine formula over all segments at once."""
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    a = (
+        np.sin(np.diff(phi) / 2) ** 2
+        + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(np.diff(lam) / 2) ** 2
+    )
+    segments = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return np.concatenate(([0.0], np.cumsum(segments)))
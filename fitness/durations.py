@@ -0,0 +1,434 @@
+"""
+Duration parsing & formatting shared by the fitness scripts, plus streaming
+sums & stats of files of durations (for time_sum.py).
+
+Durations are written as H:MM:SS, MM:SS, or SS, e.g. "1:22:57", "13:45", or
+"45", & the seconds may have a fractional part, e.g. "1:23.45" (as lap times
+from watches do). The leading field can be any size ("90" is 1:30 & "75:00"
+is 1:15:00), but the fields after it must be under 60.
+
+Usage:
+    from durations import format_duration, parse_duration, parse_durations
+
+    parse_duration("1:22:57")         # 4977
+    parse_duration("1:23.45")         # 83.45
+    parse_durations(["13", "13:14"])  # [13, 794]
+    format_duration(4977)             # "1:22:57"
+
+    total, count = sum_files(["laps1.txt", "laps2.txt"], jobs=4, use_numpy=True)
+    groups = stats_files(["runs.csv"], column="duration", group_by=["athlete"])
+
+Files hold whitespace-separated durations (typically one per line), or CSV
+with a header row when a column is given, & are streamed in fixed-size
+chunks, so memory use doesn't grow with file size. Several files are read in
+parallel processes. With `use_numpy`, sums parse each chunk with vectorized
+NumPy operations (see `sum_chunk_numpy()`), which is several times faster.
+
+Dependencies for `use_numpy`: `pip install numpy`
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import functools
+import io
+from itertools import islice, repeat
+import math
+import operator
+import re
+
+
+# A leading field of any size, up to two more fields under 60, & a fraction
+# of the last field
+_PATTERN = r"(\d+)(?::([0-5]?\d))?(?::([0-5]?\d))?(\.\d+)?"
+
+# [[H:]MM:]SS[.fff]
+DURATION_RE = re.compile(_PATTERN, re.ASCII)
+
+# One duration per line, for matching many joined by newlines in one pass
+_DURATION_LINES_RE = re.compile(rf"^{_PATTERN}$", re.ASCII | re.MULTILINE)
+
+# Distinct strings `parse_duration()` remembers
+CACHE_SIZE = 1 << 16
+
+# Bytes read from a file at a time
+CHUNK_SIZE = 1 << 20
+
+# CSV rows grouped at a time by `stats_stream()`
+BATCH_ROWS = 1 << 16
+
+# Byte classes for `sum_chunk_numpy()`; INVALID is 0, so all() rules it out
+INVALID, DIGIT, COLON, SPACE = range(4)
+
+# What bytes.split() treats as whitespace
+WHITESPACE = b" \t\n\r\v\f"
+
+# Longest field `sum_chunk_numpy()` parses, so values fit in int64
+MAX_FIELD_DIGITS = 12
+
+
+def _invalid(text):
+    return ValueError(
+        f"Invalid time: '{text}'. Expected H:MM:SS, MM:SS, or SS "
+        "(e.g. 1:22:57, 13:45, 45, or 1:23.45)."
+    )
+
+
+def _to_seconds(first, second, third, fraction):
+    """Seconds from the groups of a DURATION_RE match."""
+    seconds = int(first)
+    if second:
+        seconds = seconds * 60 + int(second)
+        if third:
+            seconds = seconds * 60 + int(third)
+    if fraction:
+        return seconds + float(fraction)
+    return seconds
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_duration(text):
+    """Parse a duration string into seconds: an int, or a float if the
+    seconds have a fractional part. Raises ValueError if it isn't H:MM:SS,
+    MM:SS, or SS. Results are cached, as logs repeat the same times a lot."""
+    match = DURATION_RE.fullmatch(text)
+    if match is None:
+        raise _invalid(text)
+    return _to_seconds(*match.groups())
+
+
+def parse_durations(strings):
+    """Parse many duration strings (e.g. a list, or a NumPy array of str) at
+    once & return a list of seconds.
+
+    Each distinct string is parsed once, & all of them are matched in one
+    regex pass over them joined by newlines, which is much faster than
+    calling `parse_duration()` on each. Raises ValueError for the first
+    invalid string.
+    """
+    strings = list(strings)
+    distinct = list(dict.fromkeys(strings))
+    text = "\n".join(distinct)
+    matches = _DURATION_LINES_RE.findall(text)
+    if len(matches) != len(distinct) or text.count("\n") != len(distinct) - 1:
+        # Some string is invalid (or holds a newline), so find it
+        return [parse_duration(s) for s in strings]
+    values = [_to_seconds(*groups) for groups in matches]
+    if len(distinct) == len(strings):
+        return values
+    return list(map(dict(zip(distinct, values)).__getitem__, strings))
+
+
+def sum_durations(strings):
+    """Return the total seconds of many duration strings, like
+    `sum(parse_durations(strings))` but much faster when they're all whole
+    seconds."""
+    strings = list(strings)
+    joined = "".join(strings)
+    if joined.isascii() and joined.isdigit():
+        try:
+            return sum(map(int, strings))
+        except ValueError:  # an empty string
+            pass
+    return sum(parse_durations(strings))
+
+
+def format_duration(seconds, decimals=None, short=False):
+    """Format seconds as H:MM:SS (no leading zeros), with `decimals` digits
+    of fractional seconds (default: none for an int, 2 for a float). With
+    `short`, hours are left off when zero, e.g. "6:31" rather than
+    "0:06:31"."""
+    if decimals is None:
+        decimals = 2 if isinstance(seconds, float) else 0
+    scale = 10**decimals
+    units = round(seconds * scale)
+    hours, units = divmod(units, 3600 * scale)
+    minutes, units = divmod(units, 60 * scale)
+    fraction = f".{units % scale:0{decimals}}" if decimals else ""
+    if short and not hours:
+        return f"{minutes}:{units // scale:02}{fraction}"
+    return f"{hours}:{minutes:02}:{units // scale:02}{fraction}"
+
+
+class DurationStats:
+    """Streaming count, total, mean, min, max & approximate quantiles of
+    durations in seconds.
+
+    Quantiles come from a DDSketch-style sketch: positive durations are
+    counted in logarithmic buckets that are RELATIVE_ACCURACY wide, so any
+    quantile is within that fraction of the true value & memory grows with
+    the range of durations (about 1,000 buckets from 0.01s to a week), not
+    their number. Sketches of separate inputs merge exactly by adding bucket
+    counts, so stats from files read in parallel can be combined.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    LOG_GAMMA = math.log(GAMMA)
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.zero_count = 0
+        self.buckets = {}
+
+    def update(self, durations):
+        """Add an iterable of durations."""
+        buckets = self.buckets
+        log, ceil, log_gamma = math.log, math.ceil, self.LOG_GAMMA
+        count, total, low, high = self.count, self.total, self.min, self.max
+        for seconds in durations:
+            count += 1
+            total += seconds
+            if low is None:
+                low = high = seconds
+            elif seconds < low:
+                low = seconds
+            elif seconds > high:
+                high = seconds
+            if seconds > 0:
+                index = ceil(log(seconds) / log_gamma)
+                buckets[index] = buckets.get(index, 0) + 1
+            else:
+                self.zero_count += 1
+        self.count, self.total, self.min, self.max = count, total, low, high
+
+    def merge(self, other):
+        """Add the durations counted by another DurationStats."""
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q):
+        """Return the approximate `q` quantile (0 ≤ q ≤ 1), or None if no
+        durations were added."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.min
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint (by relative error) of the bucket's range
+                estimate = 2 * self.GAMMA**index / (self.GAMMA + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+
+def iter_chunks(f, size=CHUNK_SIZE):
+    """Yield chunks of binary file `f`, each ending in a newline so no time
+    is split across chunks."""
+    rest = b""
+    while chunk := f.read(size):
+        chunk = rest + chunk
+        cut = chunk.rfind(b"\n") + 1
+        if cut:
+            yield chunk[:cut]
+        rest = chunk[cut:]
+    if rest:
+        yield rest + b"\n"
+
+
+def sum_chunk(chunk):
+    """Return (total seconds, number of times) for a chunk of times."""
+    tokens = chunk.decode().split()
+    return sum_durations(tokens), len(tokens)
+
+
+@functools.cache
+def _byte_classes():
+    """Byte → class lookup table for `sum_chunk_numpy()`."""
+    import numpy as np
+
+    byte_classes = np.full(256, INVALID, dtype=np.uint8)
+    byte_classes[np.frombuffer(b"0123456789", dtype=np.uint8)] = DIGIT
+    byte_classes[ord(":")] = COLON
+    byte_classes[np.frombuffer(WHITESPACE, dtype=np.uint8)] = SPACE
+    return byte_classes
+
+
+def sum_chunk_numpy(chunk):
+    """Vectorized `sum_chunk()`, for chunks ending in whitespace.
+
+    Works on the separators (colons & whitespace) rather than every byte:
+    each field is the digits before a separator, & counts ×3600, ×60, or ×1
+    by whether it & the next separator are colons. Chunks with anything
+    else, e.g. fractional seconds or a bad time, go to `sum_chunk()`, which
+    handles them (or raises) as usual.
+    """
+    import numpy as np
+
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+    classes = np.take(_byte_classes(), buf)
+    if not classes.all():
+        return sum_chunk(chunk)
+    separators = np.flatnonzero(classes != DIGIT)
+    is_colon = classes[separators] == COLON
+    after_colon = np.concatenate(([False], is_colon[:-1]))
+    before_colon = np.concatenate((is_colon[1:], [False]))
+    lengths = np.empty_like(separators)
+    lengths[0] = separators[0]
+    np.subtract(separators[1:], separators[:-1] + 1, out=lengths[1:])
+    longest = int(lengths.max())
+    if (
+        longest > MAX_FIELD_DIGITS
+        # Colons need digits on both sides, & a time has at most two
+        or ((is_colon | after_colon) & (lengths == 0)).any()
+        or (is_colon & before_colon & np.append(before_colon[1:], False)).any()
+    ):
+        return sum_chunk(chunk)
+
+    values = np.zeros(len(separators), dtype=np.int64)
+    for k in range(longest):
+        digits = buf[separators - 1 - k].astype(np.int64) - ord("0")
+        values += digits * ((k < lengths) * 10**k)
+    if (
+        # Fields after a colon must be under 60
+        (after_colon & ((lengths > 2) | (values >= 60))).any()
+        # & the total must fit in int64
+        or int(values.max()) * 3600 * len(values) >= 1 << 63
+    ):
+        return sum_chunk(chunk)
+
+    weights = np.where(is_colon, np.where(before_colon, 3600, 60), 1)
+    total = int(np.dot(values, weights))
+    count = int(np.count_nonzero(~is_colon & (lengths > 0)))
+    return total, count
+
+
+def sum_stream(f, name, use_numpy=False):
+    """Stream binary file `f` of times & return (total seconds, number of
+    times). Raises ValueError naming the file on a bad time."""
+    summer = sum_chunk_numpy if use_numpy else sum_chunk
+    total = count = 0
+    for chunk in iter_chunks(f):
+        try:
+            chunk_total, chunk_count = summer(chunk)
+        except (UnicodeDecodeError, ValueError) as e:
+            raise ValueError(f"{name}: {e}") from None
+        total += chunk_total
+        count += chunk_count
+    return total, count
+
+
+def sum_file(path, use_numpy=False):
+    """`sum_stream()` for the file at `path`."""
+    with open(path, "rb") as f:
+        return sum_stream(f, path, use_numpy)
+
+
+def sum_files(paths, jobs=1, use_numpy=False):
+    """Sum several files, in parallel when `jobs` > 1, & merge the results
+    into (total seconds, number of times)."""
+    if jobs == 1 or len(paths) == 1:
+        results = [sum_file(path, use_numpy) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+            results = list(pool.map(sum_file, paths, repeat(use_numpy)))
+    return sum(total for total, _ in results), sum(count for _, count in results)
+
+
+def _key_getter(indices):
+    """Return a function from a row to the tuple of its values at `indices`."""
+    if not indices:
+        return lambda row: ()
+    if len(indices) == 1:
+        index = indices[0]
+        return lambda row: (row[index],)
+    return operator.itemgetter(*indices)
+
+
+def stats_stream(f, name, column=None, group_by=()):
+    """Stream binary file `f` of times & return {group key: DurationStats}.
+
+    Without `column`, `f` holds whitespace-separated times, all in group ().
+    Otherwise it's CSV with a header row: times come from `column` & group
+    keys are tuples of the `group_by` columns' values. Raises ValueError
+    naming the file on a bad time or a missing column.
+    """
+    if column is None:
+        stats = DurationStats()
+        for chunk in iter_chunks(f):
+            try:
+                stats.update(parse_durations(chunk.decode().split()))
+            except (UnicodeDecodeError, ValueError) as e:
+                raise ValueError(f"{name}: {e}") from None
+        return {(): stats}
+
+    rows = csv.reader(io.TextIOWrapper(f, newline=""))
+    header = next(rows, [])
+    for wanted in [column, *group_by]:
+        if wanted not in header:
+            raise ValueError(f"{name}: no {wanted!r} column")
+    time_index = header.index(column)
+    key_indices = [header.index(key) for key in group_by]
+
+    key_of = _key_getter(key_indices)
+    groups = {}
+    while True:
+        # Group a batch of rows' times by key, then parse & count each group's
+        # times in bulk, which is much faster than row by row
+        line_num = rows.line_num
+        pending = {}
+        try:
+            for row in islice(rows, BATCH_ROWS):
+                if row:
+                    key = key_of(row)
+                    if key in pending:
+                        pending[key].append(row[time_index])
+                    else:
+                        pending[key] = [row[time_index]]
+        except IndexError:
+            raise ValueError(f"{name}: line {rows.line_num}: too few columns") from None
+        except UnicodeDecodeError as e:
+            raise ValueError(f"{name}: line {rows.line_num}: {e}") from None
+        if rows.line_num == line_num:
+            return groups
+        for key, times in pending.items():
+            if key not in groups:
+                groups[key] = DurationStats()
+            try:
+                groups[key].update(parse_durations(times))
+            except ValueError as e:
+                raise ValueError(f"{name}: {e}") from None
+
+
+def stats_file(path, column=None, group_by=()):
+    """`stats_stream()` for the file at `path`."""
+    with open(path, "rb") as f:
+        return stats_stream(f, path, column, group_by)
+
+
+def merge_groups(into, groups):
+    """Merge {group key: DurationStats} `groups` into `into`."""
+    for key, stats in groups.items():
+        if key in into:
+            into[key].merge(stats)
+        else:
+            into[key] = stats
+
+
+def stats_files(paths, jobs=1, column=None, group_by=()):
+    """Stats of several files, read in parallel when `jobs` > 1, merged into
+    one {group key: DurationStats}."""
+    if jobs == 1 or len(paths) == 1:
+        results = [stats_file(path, column, group_by) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+            results = pool.map(stats_file, paths, repeat(column), repeat(group_by))
+    groups = {}
+    for result in results:
+        merge_groups(groups, result)
+    return groups
@@ -0,0 +1,343 @@
+"""
+Garmin FIT activity file decoder, for pfitz_hr_ranges.py, time_sum.py &
+precise_race_splits.py.
+
+Decodes the record (samples: time, position, altitude, heart rate, cadence,
+distance, speed), lap & session messages of .fit files into NumPy arrays.
+Files are memory-mapped & each run of back-to-back messages with the same
+layout (e.g. hours of 1 Hz records) is read as one structured array over the
+mapping without copying, & runs are only joined (copied) when there are
+several. Scaled fields are floats in meters, m/s, degrees, bpm & seconds,
+with NaN for missing values.
+
+Usage:
+    from fit import read_fit, read_fits
+
+    activity = read_fit("run.fit")
+    hr = activity["record"]["heart_rate"]
+    lap_times = activity["lap"]["total_timer_time"]
+    activities = read_fits(paths, jobs=8)
+
+Dependencies: `pip install numpy`
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import math
+import mmap
+import struct
+
+import numpy as np
+
+
+# Seconds from the Unix epoch to the FIT epoch (1989-12-31 00:00 UTC)
+FIT_EPOCH = 631_065_600
+
+# Global message numbers of the messages decoded
+MESSAGES = {"session": 18, "lap": 19, "record": 20}
+
+TIMESTAMP_FIELD = 253
+
+SEMICIRCLES_PER_DEGREE = 2**31 / 180
+
+# Fields decoded per message: number -> (name, scale, offset), where value =
+# raw / scale - offset
+FIELDS = {
+    "record": {
+        253: ("timestamp", 1, 0),
+        0: ("position_lat", SEMICIRCLES_PER_DEGREE, 0),
+        1: ("position_long", SEMICIRCLES_PER_DEGREE, 0),
+        2: ("altitude", 5, 500),
+        3: ("heart_rate", 1, 0),
+        4: ("cadence", 1, 0),
+        5: ("distance", 100, 0),
+        6: ("speed", 1000, 0),
+        73: ("enhanced_speed", 1000, 0),
+        78: ("enhanced_altitude", 5, 500),
+    },
+    "lap": {
+        253: ("timestamp", 1, 0),
+        2: ("start_time", 1, 0),
+        7: ("total_elapsed_time", 1000, 0),
+        8: ("total_timer_time", 1000, 0),
+        9: ("total_distance", 100, 0),
+        15: ("avg_heart_rate", 1, 0),
+        16: ("max_heart_rate", 1, 0),
+    },
+    "session": {
+        253: ("timestamp", 1, 0),
+        2: ("start_time", 1, 0),
+        7: ("total_elapsed_time", 1000, 0),
+        8: ("total_timer_time", 1000, 0),
+        9: ("total_distance", 100, 0),
+        16: ("avg_heart_rate", 1, 0),
+        17: ("max_heart_rate", 1, 0),
+    },
+}
+
+# FIT base type number -> (NumPy type code, invalid value)
+BASE_TYPES = {
+    0x00: ("u1", 0xFF),  # enum
+    0x01: ("i1", 0x7F),
+    0x02: ("u1", 0xFF),
+    0x03: ("i2", 0x7FFF),
+    0x04: ("u2", 0xFFFF),
+    0x05: ("i4", 0x7FFFFFFF),
+    0x06: ("u4", 0xFFFFFFFF),
+    0x08: ("f4", np.nan),
+    0x09: ("f8", np.nan),
+    0x0A: ("u1", 0),  # uint8z
+    0x0B: ("u2", 0),  # uint16z
+    0x0C: ("u4", 0),  # uint32z
+    0x0D: ("u1", 0xFF),  # byte
+    0x0E: ("i8", 0x7FFFFFFFFFFFFFFF),
+    0x0F: ("u8", 0xFFFFFFFFFFFFFFFF),
+    0x10: ("u8", 0),  # uint64z
+}
+
+# Headers compared at first when measuring a run of messages; each further
+# probe compares 4 times as many, so short & long runs are both cheap
+RUN_PROBE = 16
+
+
+class Definition:
+    """Layout of one local message type: its global message, size in bytes
+    (with the record header), & the decoded fields' dtype & invalid values."""
+
+    def __init__(self, message, size, dtype, invalid, timestamp_offset):
+        self.message = message
+        self.size = size
+        self.dtype = dtype
+        self.invalid = invalid
+        self.timestamp_offset = timestamp_offset
+
+
+def _definition_length(mm, pos, end, developer):
+    """Length in bytes of the definition message at `pos`, or None if the
+    data ends (at `end`) before it does."""
+    if pos + 6 > end:
+        return None
+    length = 6 + 3 * mm[pos + 5]
+    if developer:
+        if pos + length >= end:
+            return None
+        length += 1 + 3 * mm[pos + length]
+    return length if pos + length <= end else None
+
+
+def _parse_definition(mm, pos, developer):
+    """Parse the definition message at `pos`. Returns (its Definition, with
+    no message or dtype if it isn't decoded, its length in bytes)."""
+    big_endian = mm[pos + 2] == 1
+    endian = ">" if big_endian else "<"
+    (global_num,) = struct.unpack_from(endian + "H", mm, pos + 3)
+    field_count = mm[pos + 5]
+    fields_pos = pos + 6
+    length = 6 + 3 * field_count
+    if developer:
+        length += 1 + 3 * mm[pos + length]
+
+    message = next((m for m, num in MESSAGES.items() if num == global_num), None)
+    known = FIELDS.get(message, {})
+    names, formats, offsets, invalid = [], [], [], {}
+    timestamp_offset = None
+    offset = 1  # after the record header
+    for i in range(field_count):
+        number, size, base_type = mm[fields_pos + 3 * i : fields_pos + 3 * i + 3]
+        type_code, bad = BASE_TYPES.get(base_type & 0x1F, (None, None))
+        if number == TIMESTAMP_FIELD and size == 4:
+            timestamp_offset = (offset, endian + "I")
+        if number in known and type_code and np.dtype(type_code).itemsize == size:
+            name = known[number][0]
+            names.append(name)
+            formats.append(endian + type_code)
+            offsets.append(offset)
+            invalid[name] = bad
+        offset += size
+    if developer:
+        dev_pos = pos + 6 + 3 * field_count
+        for i in range(mm[dev_pos]):
+            offset += mm[dev_pos + 2 + 3 * i]
+
+    if message is None:
+        # Still needed to skip its messages & track timestamps
+        return Definition(None, offset, None, None, timestamp_offset), length
+    dtype = np.dtype(
+        {"names": names, "formats": formats, "offsets": offsets, "itemsize": offset}
+    )
+    return Definition(message, offset, dtype, invalid, timestamp_offset), length
+
+
+def _run_length(mm, pos, size, end):
+    """Number of back-to-back messages of `size` bytes from `pos` with the
+    same record header byte as the one at `pos`."""
+    header = mm[pos]
+    count = 1
+    probe = RUN_PROBE
+    while True:
+        n = min(probe, (end - pos) // size - count)
+        if n <= 0:
+            return count
+        headers = np.frombuffer(
+            mm, np.uint8, count=(n - 1) * size + 1, offset=pos + count * size
+        )[::size]
+        mismatches = np.flatnonzero(headers != header)
+        if mismatches.size:
+            return count + int(mismatches[0])
+        count += n
+        probe *= 4
+
+
+def _scan(mm, pos, end, runs):
+    """Find the decoded messages of one FIT file's data (from `pos` to
+    `end`), appending (Definition, offset, count, compressed timestamp or
+    None) runs to `runs` by message name."""
+    definitions = {}
+    timestamp = 0
+    while pos < end:
+        header = mm[pos]
+        if header & 0x80:
+            # Compressed timestamp header: 5 bits of time since the last
+            # full timestamp
+            definition = definitions.get((header >> 5) & 0x03)
+            if definition is None:
+                raise ValueError(f"undefined message type at byte {pos}")
+            timestamp += ((header & 0x1F) - timestamp) & 0x1F
+            if pos + definition.size > end:
+                break
+            if definition.message:
+                runs[definition.message].append((definition, pos, 1, timestamp))
+            pos += definition.size
+            continue
+        local = header & 0x0F
+        if header & 0x40:
+            if _definition_length(mm, pos, end, header & 0x20) is None:
+                break  # truncated, as below
+            definitions[local], length = _parse_definition(mm, pos, header & 0x20)
+            pos += length
+            continue
+        definition = definitions.get(local)
+        if definition is None:
+            raise ValueError(f"undefined message type at byte {pos}")
+        if pos + definition.size > end:
+            break  # a truncated file, e.g. from a watch that crashed
+        count = _run_length(mm, pos, definition.size, end)
+        if definition.message:
+            runs[definition.message].append((definition, pos, count, None))
+        if definition.timestamp_offset:
+            offset, fmt = definition.timestamp_offset
+            last = pos + (count - 1) * definition.size
+            (timestamp,) = struct.unpack_from(fmt, mm, last + offset)
+        pos += count * definition.size
+
+
+def _field(parts, name, raw):
+    """Concatenate field `name` of runs of structured arrays, filling runs
+    without it with its invalid value. A lone raw field stays a view."""
+    with_field = [(a, d) for a, d, _ in parts if name in (a.dtype.names or ())]
+    if raw and len(parts) == 1 and with_field:
+        return parts[0][0][name]
+    if with_field:
+        array, definition = with_field[0]
+        dtype, fill = array.dtype[name], definition.invalid[name]
+    else:  # only compressed timestamps
+        dtype, fill = np.dtype(np.uint32), 0xFFFFFFFF
+
+    columns = []
+    for array, definition, compressed in parts:
+        if name in (array.dtype.names or ()):
+            column, bad = array[name], definition.invalid[name]
+        elif name == "timestamp" and compressed is not None:
+            column, bad = np.array([compressed], dtype=np.uint32), None
+        else:
+            column, bad = np.full(len(array), fill, dtype), fill
+        if not raw:
+            float_nan = isinstance(bad, float) and math.isnan(bad)
+            invalid = None if bad is None or float_nan else column == bad
+            column = column.astype(np.float64)
+            if invalid is not None:
+                column[invalid] = np.nan
+        columns.append(column)
+    return np.concatenate(columns)
+
+
+def _decode(mm, runs, raw):
+    decoded = {}
+    for message, message_runs in runs.items():
+        parts = [
+            (
+                np.frombuffer(mm, definition.dtype, count=count, offset=pos),
+                definition,
+                ts,
+            )
+            for definition, pos, count, ts in message_runs
+        ]
+        names = {name for array, _, _ in parts for name in array.dtype.names or ()}
+        if any(ts is not None for _, _, ts in parts):
+            names.add("timestamp")
+        fields = {}
+        for name, scale, offset in FIELDS[message].values():
+            if name not in names:
+                continue
+            column = _field(parts, name, raw)
+            if not raw and name in ("timestamp", "start_time"):
+                column = column + FIT_EPOCH
+            elif not raw and (scale != 1 or offset):
+                column = column / scale - offset
+            fields[name] = column
+        decoded[message] = fields
+    return decoded
+
+
+def read_fit(path, raw=False):
+    """Decode the record, lap & session messages of a .fit file.
+
+    Returns {"record": {...}, "lap": {...}, "session": {...}}, each a dict of
+    field name -> array with an element per message (messages without a
+    field get NaN). Timestamps are Unix seconds, & other fields are scaled
+    to meters, m/s, degrees, bpm & seconds. With `raw`, fields are the
+    file's integers instead (e.g. semicircles & centimeters, with FIT's
+    invalid values), which are read-only views into the file if all of a
+    message's are back to back (& copies otherwise). Raises ValueError if it
+    isn't a FIT file.
+
+    The header & file CRCs aren't checked, as a byte-at-a-time CRC in
+    Python would take far longer than decoding; a corrupt file may decode
+    to garbage values rather than raise.
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # an empty file
+            raise ValueError(f"{path}: not a FIT file") from None
+    runs = {message: [] for message in MESSAGES}
+    pos = 0
+    # FIT files can be chained, each with its own header & CRC
+    while pos + 12 <= len(mm):
+        header_size = mm[pos]
+        (data_size,) = struct.unpack_from("<I", mm, pos + 4)
+        if header_size < 12 or mm[pos + 8 : pos + 12] != b".FIT":
+            if pos == 0:
+                raise ValueError(f"{path}: not a FIT file")
+            break
+        start = pos + header_size
+        end = min(start + data_size, len(mm))
+        try:
+            _scan(mm, start, end, runs)
+        except (IndexError, struct.error):
+            raise ValueError(f"{path}: truncated or corrupt FIT data") from None
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from None
+        pos = start + data_size + 2
+    runs = {message: r for message, r in runs.items() if r}
+    return _decode(mm, runs, raw)
+
+
+def read_fits(paths, jobs=1, raw=False):
+    """`read_fit()` each of `paths`, in `jobs` parallel processes, returning
+    a list in the same order."""
+    decode = functools.partial(read_fit, raw=raw)
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            return list(pool.map(decode, paths, chunksize=8))
+    return list(map(decode, paths))
@@ -1,12 +1,38 @@
 """
 Script to use with The Juggernaut Method™ weightlifting program to calculate new
 working maxes.
+
+Usage:
+    python juggernaut.py
+    python juggernaut.py --batch team.csv
+    python juggernaut.py --batch team.json --output new_maxes.csv
+    python juggernaut.py --formula median
+
+With no arguments, prints new working maxes for the inputs hard-coded in
+`calculate_current_maxes()`.
+
+With `--batch`, reads a CSV or JSON file (a list of objects) of athletes ×
+lifts with `athlete`, `lift`, `working_max`, `reps_performed`, &
+`last_set_weight` columns (plus optional `standard_reps`, defaulting to
+`--standard-reps`), computes every row's new working max at once with NumPy,
+& prints a table or writes it to `--output` (.csv or .json).
+
+Projected maxes use the Epley formula unless `--formula` picks another from
+one_rep_max.py, or the median/mean of all of them.
+
+Dependencies for `--batch`: `pip install numpy`
 """
 
+import argparse
 from enum import Enum
-import re
+import math
+from pathlib import Path
 import sys
-import textwrap
+from typing import NamedTuple
+
+from cli import print_records, read_records, require_numpy, write_records
+from one_rep_max import ESTIMATORS, estimate_1rm, estimate_1rm_batch
+from text_layout import fill_bullets
 
 
 if sys.version_info < (3, 10):
@@ -28,6 +54,39 @@ class WorkingMaxUpdateMethod(Enum):
     FORCE_PERCENTAGE_DIFF = 4
 
 
+# (big, small) working max increments in lbs per extra rep
+LIFT_INCREMENTS = {
+    Lift.BENCH: (2.5, 1.25),
+    Lift.SQUAT: (5.0, 2.5),
+    Lift.PRESS: (2.5, 1.25),
+    Lift.DEAD: (5.0, 2.5),
+}
+
+# New working max should stay at least 5% below the projected max
+MIN_PERCENTAGE_DIFF = 1.05
+
+# Extra reps beyond the standard reps that count toward an increment
+MAX_EXTRA_REPS = 10
+
+# Note: choosing to use Epley formula by default since it's a bit more
+# optimistic (i.e. higher vals) than Brzycki; see one_rep_max.py for others.
+DEFAULT_FORMULA = "epley"
+
+
+class WorkingMaxUpdate(NamedTuple):
+    """Result of `compute_new_working_max()`."""
+
+    new_working_max: float
+    update_method: WorkingMaxUpdateMethod
+    projected_max: float
+    extra_reps: int
+    # Increment used, for BIG_INCREMENT & SMALL_INCREMENT only
+    chosen_increment: float | None
+    small_increment: float
+    # Ratio of projected max to new working max
+    percentage_diff: float
+
+
 # From https://stackoverflow.com/a/17303428
 class format:
     PURPLE = "\033[95m"
@@ -54,20 +113,6 @@ def lift_to_string(lift):
             return "Deadlift"
 
 
-# Good resources on topic of 1RM:
-#  - https://en.wikipedia.org/wiki/One-repetition_maximum
-#  - https://observablehq.com/@mourner/one-rep-max-formulas-showdown
-#  - https://www.athlegan.com/calculate-1rm
-
-
-def calc_1rm_epley(weight, reps):
-    return weight * (1 + (reps / 30.0))
-
-
-def calc_1rm_brzycki(weight, reps):
-    return weight * (36.0 / (37 - reps))
-
-
 def diff_to_string(diff):
     # See https://stackoverflow.com/a/8885688 for formatting syntax
     return "{:.2f}".format((diff - 1.0) * 100) + "%"
@@ -87,103 +132,37 @@ def round_to_base(x, base=2.5, prec=2):
     """Round to nearest multiple of base.
 
     Args:
-        x: Number to round.
-        base: Base to round to.
+        x: Number to round, or a NumPy array to round elementwise.
+        base: Base to round to (or an array of them).
         prec: Precision to round to. Defaults to 2.
     """
-    return round(base * round(float(x) / base), prec)
-
-
-def wrap_text_with_new_lines(paragraphs, max_line_len):
-    """Wrap paragraphs of text with new lines using textwrap.
-
-    Args:
-        paragraphs: List of paragraphs to wrap. Each paragraph is a string.
-                    Strings should not contain "^" character; see note below.
-        max_line_len: Max line length to wrap to.
-
-    Note: this function was created using ChatGPT so might be a bit convoluted,
-    but the general idea is to extract ANSI codes (i.e. color codes) from the
-    paragraphs, wrap the paragraphs, then reinsert the ANSI codes. This is done
-    since textwrap doesn't handle ANSI codes well (i.e. it doesn't know that the
-    codes shouldn't be counted towards the max line length), so we temporarily
-    replace the ANSI codes with a placeholder character "^" before wrapping the
-    text. This is why the paragraphs should not contain the "^" character.
-    """
-    blank_char = " "
-    wrapped_paragraphs = []
-
-    for i in range(len(paragraphs)):
-        paragraph = paragraphs[i]
-
-        # Extract ANSI codes and replace them with placeholder "^"
-        ansi_codes = []
-        clean_paragraph = ""
-        j = 0
-        while j < len(paragraph):
-            match = re.match(r"\033\[[0-9;]*[m]", paragraph[j:])
-            if match:
-                ansi_codes.append(match.group())
-                clean_paragraph += "^"
-                j += len(match.group())
-            else:
-                clean_paragraph += paragraph[j]
-                j += 1
-
-        # First line is special case since we don't want indentation.
-        if i == 0:
-            wrapped_text = textwrap.fill(clean_paragraph, width=max_line_len)
-        else:  # Subsequent lines should use indentation
-            wrapped_text = textwrap.fill(
-                clean_paragraph,
-                width=max_line_len,
-                initial_indent=blank_char * 2,  # indent bullet points
-                subsequent_indent=blank_char * 4,  # further indent when wrapped
-            )
-
-        # Reinsert the ANSI codes sequentially
-        final_text = ""
-        ansi_index = 0
-        for char in wrapped_text:
-            if char == "^":
-                final_text += ansi_codes[ansi_index]
-                ansi_index += 1
-            else:
-                final_text += char
-
-        wrapped_paragraphs.append(final_text)
-
-    return "\n".join(wrapped_paragraphs)
-
-
-def calculate_new_working_max(
-    lift, standard_reps, working_max, reps_performed, last_set_weight
+    if isinstance(x, (int, float)) and isinstance(base, (int, float)):
+        return round(base * round(float(x) / base), prec)
+    np = require_numpy("--batch")
+    return np.round(base * np.round(np.asarray(x, dtype=np.float64) / base), prec)
+
+
+def compute_new_working_max(
+    lift,
+    standard_reps,
+    working_max,
+    reps_performed,
+    last_set_weight,
+    formula=DEFAULT_FORMULA,
 ):
-    """Calculate new working max.
+    """Compute new working max, without printing anything.
 
-    Args:
-        lift: Enum indicating lift.
-        standard_reps: Standard reps in current wave that was just completed.
-        working_max: Working max in current wave that was just completed.
-        reps_performed: Reps performed in last AMAP set in the Realization phase.
-        last_set_weight: Weight used in last AMAP set in the Realization phase.
+    Args are as for `calculate_new_working_max()`. Returns a WorkingMaxUpdate.
+    Raises ValueError for an invalid `lift`, `formula`, or `reps_performed`.
     """
-    # Note: choosing to use Epley formula since it's a bit more optimistic (i.e.
-    # higher vals) than Brzycki, but this can be adjusted later if needed.
-    projected_max = calc_1rm_epley(last_set_weight, reps_performed)
+    projected_max = estimate_1rm(last_set_weight, reps_performed, formula)
 
     # cap extra reps to at most 10
-    extra_reps = min(reps_performed - standard_reps, 10)
-
-    if lift == Lift.BENCH or lift == Lift.PRESS:
-        big_increment = 2.5
-        small_increment = 1.25
-    elif lift == Lift.SQUAT or lift == Lift.DEAD:
-        big_increment = 5.0
-        small_increment = 2.5
-    else:
-        print("Invalid `lift` passed into calculate_new_working_max")
-        return
+    extra_reps = min(reps_performed - standard_reps, MAX_EXTRA_REPS)
+
+    if lift not in LIFT_INCREMENTS:
+        raise ValueError(f"Invalid lift: {lift}")
+    big_increment, small_increment = LIFT_INCREMENTS[lift]
 
     big_working_max = working_max + extra_reps * big_increment
     small_working_max = working_max + extra_reps * small_increment
@@ -200,23 +179,25 @@ def calculate_new_working_max(
     big_percentage_diff = projected_max / big_working_max
     small_percentage_diff = projected_max / small_working_max
     current_percentage_diff = projected_max / working_max
-    if big_percentage_diff >= 1.05:
+    if big_percentage_diff >= MIN_PERCENTAGE_DIFF:
         new_working_max = big_working_max
         update_method = WorkingMaxUpdateMethod.BIG_INCREMENT
         chosen_increment = big_increment
-        diff_string = diff_to_string(big_percentage_diff)
-    elif small_percentage_diff >= 1.05:
+        percentage_diff = big_percentage_diff
+    elif small_percentage_diff >= MIN_PERCENTAGE_DIFF:
         new_working_max = small_working_max
         update_method = WorkingMaxUpdateMethod.SMALL_INCREMENT
         chosen_increment = small_increment
-        diff_string = diff_to_string(small_percentage_diff)
-    elif current_percentage_diff >= 1.05:
+        percentage_diff = small_percentage_diff
+    elif current_percentage_diff >= MIN_PERCENTAGE_DIFF:
         new_working_max = working_max
         update_method = WorkingMaxUpdateMethod.STAY_SAME
         chosen_increment = None
-        diff_string = diff_to_string(current_percentage_diff)
+        percentage_diff = current_percentage_diff
     else:
-        new_working_max = round_to_base(projected_max / 1.05, small_increment)
+        new_working_max = round_to_base(
+            projected_max / MIN_PERCENTAGE_DIFF, small_increment
+        )
         # There is an edge case here where the new working max when forced to be
         # rounded to nearest multiple of small_increment is the same as the old
         # working max. This is equivalent to STAY_SAME, so we set update_method
@@ -226,7 +207,57 @@ def calculate_new_working_max(
         else:
             update_method = WorkingMaxUpdateMethod.FORCE_PERCENTAGE_DIFF
         chosen_increment = None
-        diff_string = diff_to_string(projected_max / new_working_max)
+        percentage_diff = projected_max / new_working_max
+
+    return WorkingMaxUpdate(
+        new_working_max,
+        update_method,
+        projected_max,
+        extra_reps,
+        chosen_increment,
+        small_increment,
+        percentage_diff,
+    )
+
+
+def calculate_new_working_max(
+    lift,
+    standard_reps,
+    working_max,
+    reps_performed,
+    last_set_weight,
+    formula=DEFAULT_FORMULA,
+):
+    """Calculate & print new working max.
+
+    Args:
+        lift: Enum indicating lift.
+        standard_reps: Standard reps in current wave that was just completed.
+        working_max: Working max in current wave that was just completed.
+        reps_performed: Reps performed in last AMAP set in the Realization phase.
+        last_set_weight: Weight used in last AMAP set in the Realization phase.
+        formula: 1RM formula (or "median"/"mean" of all formulas) used for the
+                 projected max; see `one_rep_max.ESTIMATORS`.
+    """
+    try:
+        update = compute_new_working_max(
+            lift,
+            standard_reps,
+            working_max,
+            reps_performed,
+            last_set_weight,
+            formula,
+        )
+    except ValueError as e:
+        print(f"Invalid argument passed into calculate_new_working_max: {e}")
+        return
+    new_working_max = update.new_working_max
+    update_method = update.update_method
+    projected_max = update.projected_max
+    extra_reps = update.extra_reps
+    chosen_increment = update.chosen_increment
+    small_increment = update.small_increment
+    diff_string = diff_to_string(update.percentage_diff)
 
     # Prints
     paragraphs = []
@@ -275,10 +306,209 @@ def calculate_new_working_max(
         f"max is {format.BOLD}{diff_string}{format.END}."
     )
 
-    print(wrap_text_with_new_lines(paragraphs, max_line_len=100), "\n")
+    print(fill_bullets(paragraphs[0], paragraphs[1:], width=100), "\n")
 
 
-def calculate_current_maxes():
+def batch_new_working_maxes(
+    lifts,
+    standard_reps,
+    working_maxes,
+    reps_performed,
+    last_set_weights,
+    formula=DEFAULT_FORMULA,
+):
+    """Compute new working maxes for many rows at once.
+
+    Vectorized version of `compute_new_working_max()`: each arg is an array
+    (or scalar, broadcast to the others), with `lifts` holding `Lift` values
+    (ints). Projected maxes come from `one_rep_max.estimate_1rm_batch()`.
+    Returns a NumPy structured array with fields `new_working_max`,
+    `update_method` (`WorkingMaxUpdateMethod` values), `projected_max`,
+    `extra_reps`, `chosen_increment` (NaN if none), & `percentage_diff`.
+    Raises ValueError for an invalid lift, formula, or reps.
+    """
+    np = require_numpy("--batch")
+    lifts, standard_reps, working_maxes, reps_performed, last_set_weights = (
+        np.broadcast_arrays(
+            np.asarray(lifts, dtype=np.int64),
+            np.asarray(standard_reps, dtype=np.int64),
+            np.asarray(working_maxes, dtype=np.float64),
+            np.asarray(reps_performed, dtype=np.int64),
+            np.asarray(last_set_weights, dtype=np.float64),
+        )
+    )
+    valid = np.isin(lifts, [lift.value for lift in LIFT_INCREMENTS])
+    if not valid.all():
+        raise ValueError(f"Invalid lift: {lifts[~valid][0]}")
+
+    # Look up increments by Lift value
+    big_by_lift = np.zeros(max(lift.value for lift in Lift) + 1)
+    small_by_lift = np.zeros_like(big_by_lift)
+    for lift, (big, small) in LIFT_INCREMENTS.items():
+        big_by_lift[lift.value] = big
+        small_by_lift[lift.value] = small
+    big_increments = big_by_lift[lifts]
+    small_increments = small_by_lift[lifts]
+
+    projected_maxes = estimate_1rm_batch(last_set_weights, reps_performed, formula)
+    extra_reps = np.minimum(reps_performed - standard_reps, MAX_EXTRA_REPS)
+    big_working_maxes = working_maxes + extra_reps * big_increments
+    small_working_maxes = working_maxes + extra_reps * small_increments
+    forced_working_maxes = round_to_base(
+        projected_maxes / MIN_PERCENTAGE_DIFF, small_increments
+    )
+
+    # Same order of checks as compute_new_working_max()
+    conditions = [
+        projected_maxes / big_working_maxes >= MIN_PERCENTAGE_DIFF,
+        projected_maxes / small_working_maxes >= MIN_PERCENTAGE_DIFF,
+        projected_maxes / working_maxes >= MIN_PERCENTAGE_DIFF,
+    ]
+    new_working_maxes = np.select(
+        conditions,
+        [big_working_maxes, small_working_maxes, working_maxes],
+        default=forced_working_maxes,
+    )
+    update_methods = np.select(
+        conditions,
+        [
+            WorkingMaxUpdateMethod.BIG_INCREMENT.value,
+            WorkingMaxUpdateMethod.SMALL_INCREMENT.value,
+            WorkingMaxUpdateMethod.STAY_SAME.value,
+        ],
+        # Forcing a 5% diff can round back to the old working max
+        default=np.where(
+            forced_working_maxes == working_maxes,
+            WorkingMaxUpdateMethod.STAY_SAME.value,
+            WorkingMaxUpdateMethod.FORCE_PERCENTAGE_DIFF.value,
+        ),
+    )
+    chosen_increments = np.select(
+        conditions[:2], [big_increments, small_increments], default=np.nan
+    )
+
+    result = np.empty(lifts.shape, dtype=BATCH_RESULT_FIELDS)
+    result["new_working_max"] = new_working_maxes
+    result["update_method"] = update_methods
+    result["projected_max"] = projected_maxes
+    result["extra_reps"] = extra_reps
+    result["chosen_increment"] = chosen_increments
+    result["percentage_diff"] = projected_maxes / new_working_maxes
+    return result
+
+
+# Fields (& NumPy dtypes) of `batch_new_working_maxes()` results
+BATCH_RESULT_FIELDS = [
+    ("new_working_max", "f8"),
+    ("update_method", "i1"),
+    ("projected_max", "f8"),
+    ("extra_reps", "i8"),
+    ("chosen_increment", "f8"),
+    ("percentage_diff", "f8"),
+]
+
+
+def parse_lift(name):
+    """Parse a lift from its enum name (e.g. "bench") or full name (e.g.
+    "Bench Press"), case-insensitively."""
+    name = name.strip().lower()
+    for lift in Lift:
+        if name in (lift.name.lower(), lift_to_string(lift).lower()):
+            return lift
+    raise ValueError(f"Unknown lift: {name!r}")
+
+
+def load_batch_rows(path, default_standard_reps):
+    """Read athletes × lifts rows from a .csv or .json file.
+
+    Returns a list of dicts with `athlete`, `lift` (a Lift), `standard_reps`,
+    `working_max`, `reps_performed`, & `last_set_weight`. Raises ValueError
+    on a missing or malformed value.
+    """
+    records = read_records(path)
+
+    rows = []
+    for i, record in enumerate(records, start=1):
+        try:
+            standard_reps = record.get("standard_reps")
+            rows.append(
+                {
+                    "athlete": str(record.get("athlete", "")),
+                    "lift": parse_lift(str(record["lift"])),
+                    "standard_reps": int(standard_reps)
+                    if standard_reps not in (None, "")
+                    else default_standard_reps,
+                    "working_max": float(record["working_max"]),
+                    "reps_performed": int(record["reps_performed"]),
+                    "last_set_weight": float(record["last_set_weight"]),
+                }
+            )
+        except KeyError as e:
+            raise ValueError(f"Row {i}: missing {e.args[0]!r}") from None
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Row {i}: {e}") from None
+    return rows
+
+
+def batch_results_to_records(rows, results):
+    """Combine input rows & `batch_new_working_maxes()` results into
+    JSON/CSV-friendly dicts, one per row."""
+    records = []
+    for row, result in zip(rows, results):
+        chosen_increment = float(result["chosen_increment"])
+        records.append(
+            {
+                "athlete": row["athlete"],
+                "lift": lift_to_string(row["lift"]),
+                "working_max": row["working_max"],
+                "new_working_max": float(result["new_working_max"]),
+                "update_method": WorkingMaxUpdateMethod(
+                    int(result["update_method"])
+                ).name.lower(),
+                "chosen_increment": None
+                if math.isnan(chosen_increment)
+                else chosen_increment,
+                "projected_max": round(float(result["projected_max"]), 2),
+                "percentage_diff": diff_to_string(float(result["percentage_diff"])),
+            }
+        )
+    return records
+
+
+def run_batch(input_path, output_path, default_standard_reps, formula):
+    """Compute new working maxes for every row of input_path & print them as
+    a table, or write them to output_path (.csv or .json)."""
+    try:
+        rows = load_batch_rows(input_path, default_standard_reps)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not read {input_path}: {e}")
+        sys.exit(1)
+    if not rows:
+        print(f"Error: no rows in {input_path}")
+        sys.exit(1)
+
+    try:
+        results = batch_new_working_maxes(
+            [row["lift"].value for row in rows],
+            [row["standard_reps"] for row in rows],
+            [row["working_max"] for row in rows],
+            [row["reps_performed"] for row in rows],
+            [row["last_set_weight"] for row in rows],
+            formula,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    records = batch_results_to_records(rows, results)
+
+    if output_path is None:
+        print_records(records)
+    else:
+        write_records(records, output_path)
+        print(f"Wrote {len(records)} new working max(es) to {output_path}")
+
+
+def calculate_current_maxes(formula=DEFAULT_FORMULA):
     standard_reps = 5
 
     calc_bench = True
@@ -296,6 +526,7 @@ def calculate_current_maxes():
             bench_working_max,
             bench_reps_performed,
             bench_last_set_weight,
+            formula=formula,
         )
 
     if calc_squat:
@@ -308,6 +539,7 @@ def calculate_current_maxes():
             squat_working_max,
             squat_reps_performed,
             squat_last_set_weight,
+            formula=formula,
         )
 
     if calc_press:
@@ -320,6 +552,7 @@ def calculate_current_maxes():
             press_working_max,
             press_reps_performed,
             press_last_set_weight,
+            formula=formula,
         )
 
     if calc_dead:
@@ -332,8 +565,43 @@ def calculate_current_maxes():
             dead_working_max,
             dead_reps_performed,
             dead_last_set_weight,
+            formula=formula,
         )
 
 
 if __name__ == "__main__":
-    calculate_current_maxes()
+    parser = argparse.ArgumentParser(
+        description="Calculate new Juggernaut Method working maxes."
+    )
+    parser.add_argument(
+        "--batch",
+        type=Path,
+        help="CSV or JSON file of athletes × lifts to calculate all at once",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="With --batch, write results to this .csv or .json file instead of printing",
+    )
+    parser.add_argument(
+        "--standard-reps",
+        type=int,
+        default=5,
+        help="With --batch, standard reps for rows without a standard_reps value (default: 5)",
+    )
+    parser.add_argument(
+        "-f",
+        "--formula",
+        choices=ESTIMATORS,
+        default=DEFAULT_FORMULA,
+        help=f"1RM formula for projected maxes, or the median/mean of all of them (default: {DEFAULT_FORMULA})",
+    )
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch(args.batch, args.output, args.standard_reps, args.formula)
+    elif args.output:
+        parser.error("--output requires --batch")
+    else:
+        calculate_current_maxes(args.formula)
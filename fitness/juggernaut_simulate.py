@@ -0,0 +1,311 @@
+"""
+Monte Carlo projection of Juggernaut Method™ working maxes over future
+16-week cycles, using the same working max rules as juggernaut.py.
+
+Each cycle is four waves (10s, 8s, 5s, 3s). At the end of each wave, the
+Realization AMAP set is taken at a fixed percentage of the working max
+(rounded to the nearest 2.5 lbs), the reps performed are drawn from a
+per-lift normal distribution of extra reps over the standard reps, & the
+working max is updated with `juggernaut.batch_new_working_maxes()`. Many
+trajectories are simulated per athlete × lift, & percentile bands of the
+working max after each cycle (or wave) are reported.
+
+Usage:
+    python juggernaut_simulate.py team.csv
+    python juggernaut_simulate.py team.csv --cycles 3 --trajectories 100000 --jobs 8
+    python juggernaut_simulate.py team.json --waves --output bands.json
+
+The input is a CSV or JSON file (a list of objects) with `athlete`, `lift`,
+& `working_max` columns, plus optional `mean_extra_reps` & `sd_extra_reps`
+(defaulting to `--mean-extra-reps` & `--sd-extra-reps`).
+
+Trajectories are simulated in fixed-size chunks across a process pool, each
+chunk seeded from (`--seed`, row, chunk), so results are the same for any
+`--jobs`. Working maxes only take a few distinct values (the starting max
+plus whole increments, or rounded to one), so each chunk returns counts of
+each value rather than every trajectory, & memory doesn't grow with
+`--trajectories`.
+
+Dependencies: `pip install numpy`
+"""
+
+import argparse
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+
+from cli import print_records, read_records, write_records
+from juggernaut import (
+    DEFAULT_FORMULA,
+    batch_new_working_maxes,
+    lift_to_string,
+    parse_lift,
+    round_to_base,
+)
+from one_rep_max import ESTIMATORS, REP_TABLE_MAX
+
+
+# (standard reps, Realization AMAP set % of working max) per wave of a cycle
+WAVES = [(10, 0.75), (8, 0.80), (5, 0.85), (3, 0.90)]
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Trajectories per pool task; fixed so results don't depend on --jobs
+CHUNK_SIZE = 10_000
+
+
+def simulate_chunk(
+    lift, working_max, mean_extra_reps, sd_extra_reps, cycles, size, seed, formula
+):
+    """Simulate `size` trajectories of one athlete's lift.
+
+    `seed` is a sequence of ints for `np.random.default_rng()`. Returns a
+    list of (values, counts) arrays, from `np.unique()`, of the working max
+    before the first wave & after each wave.
+    """
+    rng = np.random.default_rng(seed)
+    working_maxes = np.full(size, float(working_max))
+    history = [np.unique(working_maxes, return_counts=True)]
+    for _ in range(cycles):
+        for standard_reps, percentage in WAVES:
+            last_set_weights = round_to_base(working_maxes * percentage)
+            reps_performed = np.clip(
+                np.rint(
+                    rng.normal(standard_reps + mean_extra_reps, sd_extra_reps, size)
+                ),
+                0,
+                REP_TABLE_MAX,
+            ).astype(np.int64)
+            working_maxes = batch_new_working_maxes(
+                lift,
+                standard_reps,
+                working_maxes,
+                reps_performed,
+                last_set_weights,
+                formula,
+            )["new_working_max"]
+            history.append(np.unique(working_maxes, return_counts=True))
+    return history
+
+
+def merge_counts(first, second):
+    """Merge two (values, counts) pairs from `np.unique()` into one."""
+    values, inverse = np.unique(
+        np.concatenate([first[0], second[0]]), return_inverse=True
+    )
+    counts = np.bincount(inverse, np.concatenate([first[1], second[1]]))
+    return values, counts.astype(np.int64)
+
+
+def counts_percentiles(values, counts, percentiles):
+    """Percentiles of `values` repeated `counts` times (both sorted by value,
+    as from `np.unique()`), interpolated like `np.percentile()`."""
+    positions = (counts.sum() - 1) * np.asarray(percentiles) / 100
+    lower = np.floor(positions)
+    # The repeated values either side of each position, by cumulative count
+    ends = np.cumsum(counts)
+    below = values[np.searchsorted(ends, lower, side="right")]
+    above = values[np.searchsorted(ends, np.ceil(positions), side="right")]
+    return below + (positions - lower) * (above - below)
+
+
+def simulate(rows, cycles, trajectories, jobs, seed, formula):
+    """Simulate every row (a dict from `load_rows()`) & return, per row, an
+    array of shape (cycles * len(WAVES) + 1, len(PERCENTILES)) of working
+    max percentiles before the first wave & after each wave."""
+    tasks = []
+    for row_index, row in enumerate(rows):
+        for chunk_index, start in enumerate(range(0, trajectories, CHUNK_SIZE)):
+            tasks.append(
+                (
+                    row_index,
+                    (
+                        row["lift"].value,
+                        row["working_max"],
+                        row["mean_extra_reps"],
+                        row["sd_extra_reps"],
+                        cycles,
+                        min(CHUNK_SIZE, trajectories - start),
+                        [seed, row_index, chunk_index],
+                        formula,
+                    ),
+                )
+            )
+
+    # Merge each row's chunks as they arrive, so only counts are kept
+    per_row = [None] * len(rows)
+
+    def merge(row_index, chunk):
+        merged = per_row[row_index]
+        per_row[row_index] = (
+            chunk
+            if merged is None
+            else [merge_counts(*step) for step in zip(merged, chunk)]
+        )
+
+    if jobs == 1:
+        for row_index, args in tasks:
+            merge(row_index, simulate_chunk(*args))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunks = pool.map(simulate_chunk, *zip(*(args for _, args in tasks)))
+            for (row_index, _), chunk in zip(tasks, chunks):
+                merge(row_index, chunk)
+
+    return [
+        np.array(
+            [counts_percentiles(values, counts, PERCENTILES) for values, counts in row]
+        )
+        for row in per_row
+    ]
+
+
+def load_rows(path, default_mean_extra_reps, default_sd_extra_reps):
+    """Read athlete × lift rows from a .csv or .json file.
+
+    Returns a list of dicts with `athlete`, `lift` (a Lift), `working_max`,
+    `mean_extra_reps`, & `sd_extra_reps`. Raises ValueError on a missing or
+    malformed value.
+    """
+    records = read_records(path)
+
+    def optional_float(record, key, default):
+        value = record.get(key)
+        return default if value in (None, "") else float(value)
+
+    rows = []
+    for i, record in enumerate(records, start=1):
+        try:
+            row = {
+                "athlete": str(record.get("athlete", "")),
+                "lift": parse_lift(str(record["lift"])),
+                "working_max": float(record["working_max"]),
+                "mean_extra_reps": optional_float(
+                    record, "mean_extra_reps", default_mean_extra_reps
+                ),
+                "sd_extra_reps": optional_float(
+                    record, "sd_extra_reps", default_sd_extra_reps
+                ),
+            }
+        except KeyError as e:
+            raise ValueError(f"Row {i}: missing {e.args[0]!r}") from None
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Row {i}: {e}") from None
+        if row["sd_extra_reps"] < 0:
+            raise ValueError(f"Row {i}: sd_extra_reps must be >= 0")
+        rows.append(row)
+    return rows
+
+
+def step_labels(cycles):
+    """Label for each simulated step, e.g. "start", "c1 10s", ..., "c1 3s"."""
+    labels = ["start"]
+    for cycle in range(1, cycles + 1):
+        labels += [f"c{cycle} {standard_reps}s" for standard_reps, _ in WAVES]
+    return labels
+
+
+def bands_to_records(rows, bands, cycles, every_wave):
+    """Flatten percentile bands into one dict per row × reported step."""
+    labels = step_labels(cycles)
+    steps = range(len(labels)) if every_wave else range(0, len(labels), len(WAVES))
+    records = []
+    for row, row_bands in zip(rows, bands):
+        for step in steps:
+            record = {
+                "athlete": row["athlete"],
+                "lift": lift_to_string(row["lift"]),
+                "after": labels[step],
+            }
+            for percentile, value in zip(PERCENTILES, row_bands[step]):
+                record[f"p{percentile}"] = round(float(value), 2)
+            records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Project Juggernaut Method working maxes with Monte Carlo simulation."
+    )
+    parser.add_argument("input", type=Path, help="CSV or JSON file of athletes × lifts")
+    parser.add_argument(
+        "-c", "--cycles", type=int, default=3, help="16-week cycles (default: 3)"
+    )
+    parser.add_argument(
+        "-n",
+        "--trajectories",
+        type=int,
+        default=100_000,
+        help="Trajectories per athlete × lift (default: 100000)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: number of CPUs)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument(
+        "--mean-extra-reps",
+        type=float,
+        default=2.0,
+        help="Mean AMAP reps over standard reps, for rows without a value (default: 2)",
+    )
+    parser.add_argument(
+        "--sd-extra-reps",
+        type=float,
+        default=1.5,
+        help="Std dev of AMAP extra reps, for rows without a value (default: 1.5)",
+    )
+    parser.add_argument(
+        "-f",
+        "--formula",
+        choices=ESTIMATORS,
+        default=DEFAULT_FORMULA,
+        help=f"1RM formula for projected maxes (default: {DEFAULT_FORMULA})",
+    )
+    parser.add_argument(
+        "--waves",
+        action="store_true",
+        help="Report bands after every wave, not just every cycle",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="Write bands to this .csv or .json file instead of printing",
+    )
+    args = parser.parse_args()
+    if args.cycles < 1 or args.trajectories < 1 or args.jobs < 1:
+        parser.error("--cycles, --trajectories & --jobs must be >= 1")
+    if args.sd_extra_reps < 0:
+        parser.error("--sd-extra-reps must be >= 0")
+
+    try:
+        rows = load_rows(args.input, args.mean_extra_reps, args.sd_extra_reps)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not read {args.input}: {e}")
+        sys.exit(1)
+    if not rows:
+        print(f"Error: no rows in {args.input}")
+        sys.exit(1)
+
+    bands = simulate(
+        rows, args.cycles, args.trajectories, args.jobs, args.seed, args.formula
+    )
+    records = bands_to_records(rows, bands, args.cycles, args.waves)
+
+    if args.output is None:
+        print_records(records)
+    else:
+        write_records(records, args.output)
+        print(f"Wrote {len(records)} percentile band(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
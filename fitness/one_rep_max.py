@@ -0,0 +1,144 @@
+"""
+One-rep max (1RM) estimation formulas, for use by juggernaut.py & friends.
+
+Every supported formula has the form `weight * coefficient(reps)`, so for
+integer reps up to REP_TABLE_MAX the coefficients are precomputed into a
+reps × formula table, & estimating from arrays of sets is a table lookup &
+multiply. Besides the single formulas, "median" & "mean" combine all of them.
+
+A set of 0 reps (a missed lift) estimates the weight itself, i.e. a
+coefficient of 1, for every estimator. Some formulas would otherwise give 0
+(Lombardi) or even more than 1. Reps above REP_TABLE_MAX are rejected, as
+some formulas break down past it (Brzycki divides by zero at 37 reps & goes
+negative after that, as does Lander past about 38).
+
+Good resources on topic of 1RM:
+ - https://en.wikipedia.org/wiki/One-repetition_maximum
+ - https://observablehq.com/@mourner/one-rep-max-formulas-showdown
+ - https://www.athlegan.com/calculate-1rm
+
+Dependencies for `estimate_1rm_batch()`: `pip install numpy`
+"""
+
+import functools
+import math
+import statistics
+
+
+# Coefficient of each formula, as a function of reps (a number, or a NumPy
+# array for elementwise coefficients)
+FORMULAS = {
+    "epley": lambda reps: 1 + (reps / 30.0),
+    "brzycki": lambda reps: 36.0 / (37 - reps),
+    "lander": lambda reps: 100 / (101.3 - 2.67123 * reps),
+    "lombardi": lambda reps: reps**0.10,
+    "mayhew": lambda reps: 100 / (52.2 + 41.9 * math.e ** (-0.055 * reps)),
+    "oconner": lambda reps: 1 + (reps / 40.0),
+    "wathan": lambda reps: 100 / (48.8 + 53.8 * math.e ** (-0.075 * reps)),
+}
+
+# Estimates combining every formula
+ENSEMBLES = {
+    "median": statistics.median,
+    "mean": statistics.fmean,
+}
+
+ESTIMATORS = list(FORMULAS) + list(ENSEMBLES)
+
+# Most reps estimated from, all covered by the precomputed coefficient
+# table. The formulas get unreliable well before this many reps anyway.
+REP_TABLE_MAX = 30
+
+
+def _check_estimator(formula):
+    if formula not in FORMULAS and formula not in ENSEMBLES:
+        raise ValueError(
+            f"Unknown 1RM formula: {formula!r} (expected one of "
+            f"{', '.join(ESTIMATORS)})"
+        )
+
+
+def _check_reps(reps):
+    if not 0 <= reps <= REP_TABLE_MAX:
+        raise ValueError(f"Reps must be from 0 to {REP_TABLE_MAX}, not {reps}")
+
+
+@functools.cache
+def _coefficient_rows():
+    """Coefficient table as a tuple of rows, one per reps from 0 to
+    REP_TABLE_MAX, each holding a coefficient per ESTIMATORS entry."""
+    rows = [(1.0,) * len(ESTIMATORS)]
+    for reps in range(1, REP_TABLE_MAX + 1):
+        row = [estimate(reps) for estimate in FORMULAS.values()]
+        rows.append(tuple(row + [combine(row) for combine in ENSEMBLES.values()]))
+    return tuple(rows)
+
+
+@functools.cache
+def coefficient_table():
+    """Return the reps × estimator coefficient table as a NumPy array, with
+    a row per reps & a column per ESTIMATORS entry."""
+    import numpy as np
+
+    return np.array(_coefficient_rows())
+
+
+def coefficient(reps, formula="epley"):
+    """Return the factor `formula` multiplies the weight by for `reps` reps.
+    Raises ValueError for an unknown formula or reps outside 0 to
+    REP_TABLE_MAX."""
+    _check_estimator(formula)
+    _check_reps(reps)
+    if reps == 0:
+        return 1.0
+    if formula in FORMULAS:
+        return FORMULAS[formula](reps)
+    if isinstance(reps, int):
+        return _coefficient_rows()[reps][ESTIMATORS.index(formula)]
+    coefficients = [estimate(reps) for estimate in FORMULAS.values()]
+    return ENSEMBLES[formula](coefficients)
+
+
+def estimate_1rm(weight, reps, formula="epley"):
+    """Estimate 1RM from one set of `reps` reps at `weight`.
+
+    `formula` is a key of FORMULAS or ENSEMBLES. Raises ValueError for an
+    unknown formula or reps outside 0 to REP_TABLE_MAX.
+    """
+    return weight * coefficient(reps, formula)
+
+
+def estimate_1rm_batch(weights, reps, formula="epley"):
+    """Vectorized `estimate_1rm()` over arrays of weights & reps.
+
+    Integer reps are looked up in `coefficient_table()`, & fractional reps
+    fall back to computing the formula elementwise. Returns a NumPy array.
+    Raises ValueError for an unknown formula or reps outside 0 to
+    REP_TABLE_MAX.
+    """
+    import numpy as np
+
+    _check_estimator(formula)
+    weights, reps = np.broadcast_arrays(
+        np.asarray(weights, dtype=np.float64), np.asarray(reps)
+    )
+    if reps.size:
+        _check_reps(reps.min())
+        _check_reps(reps.max())
+    in_table = np.ones(reps.shape, dtype=bool)
+    if not np.issubdtype(reps.dtype, np.integer):
+        in_table = reps == np.floor(reps)
+    coefficients = coefficient_table()[:, ESTIMATORS.index(formula)][
+        np.where(in_table, reps, 0).astype(np.intp)
+    ]
+    if not in_table.all():
+        other_reps = reps.astype(np.float64)
+        if formula in FORMULAS:
+            other = FORMULAS[formula](other_reps)
+        else:
+            combine = {"median": np.median, "mean": np.mean}[formula]
+            other = combine(
+                [estimate(other_reps) for estimate in FORMULAS.values()], axis=0
+            )
+        coefficients = np.where(in_table, coefficients, other)
+    return weights * coefficients
@@ -1,39 +1,72 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import functools
+from itertools import pairwise
+import os
+from pathlib import Path
+import sys
 
 import pandas as pd
 from tabulate import tabulate
 
+from cli import require_numpy
+from durations import format_duration
+
 """
 Prints "HR Intensities for Standard Marathon Training Workouts" table from
 "Advanced Marathoning" book by Pfitzinger & Douglas (Page 17, Table 1.2). Usage
 described by `python pfitz_hr_ranges.py --help`.
 
+With `--streams`, classifies every sample of heart-rate streams (CSV exports
+or .fit files of activities, e.g. 1 Hz long runs, or directories of them) into
+those workout zones, by either % of maximal HR or % of HR reserve, & prints
+the time in each zone per activity & in total. The book's ranges overlap, so
+zones are split halfway through each overlap. Each file is classified with one
+vectorized sorted search over its samples, & files are read in parallel.
+
+Usage:
+    python pfitz_hr_ranges.py -m 194 -r 50
+    python pfitz_hr_ranges.py -m 194 -r 50 --streams activities/ [--method hr_reserve] [-o zones.csv]
+
 Dependencies: `pip install pandas tabulate`
+Dependencies for `--streams`: `pip install numpy`
 """
 
+WORKOUTS_TO_HR = {
+    0: {
+        "name": "V̇O2 max (5k pace)",
+        "maximal_hr": [93, 95],
+        "hr_reserve": [91, 94],
+    },
+    1: {
+        "name": "Lactate threshold",
+        "maximal_hr": [82, 91],
+        "hr_reserve": [76, 88],
+    },
+    2: {"name": "Marathon Pace", "maximal_hr": [82, 88], "hr_reserve": [76, 84]},
+    3: {
+        "name": "Long / medium-long",
+        "maximal_hr": [75, 84],
+        "hr_reserve": [66, 78],
+    },
+    4: {"name": "General aerobic", "maximal_hr": [72, 81], "hr_reserve": [62, 75]},
+    5: {"name": "Recovery", "maximal_hr": [0, 76], "hr_reserve": [0, 68]},
+}
+
+# Activity files read by --streams
+STREAM_SUFFIXES = {".csv", ".fit"}
+
+# Longest gap (seconds) between .fit samples counted as time in zone, so
+# pauses aren't
+MAX_SAMPLE_GAP = 10
+
+# Workout zones from easiest to hardest, as HR samples are classified
+ZONES = [WORKOUTS_TO_HR[i]["name"] for i in reversed(range(len(WORKOUTS_TO_HR)))]
+
 
 def print_pfitz_hr_ranges(max_hr: int, resting_hr: int, table_type: str):
     hr_reserve = max_hr - resting_hr
-    workouts_to_hr = {
-        0: {
-            "name": "V̇O2 max (5k pace)",
-            "maximal_hr": [93, 95],
-            "hr_reserve": [91, 94],
-        },
-        1: {
-            "name": "Lactate threshold",
-            "maximal_hr": [82, 91],
-            "hr_reserve": [76, 88],
-        },
-        2: {"name": "Marathon Pace", "maximal_hr": [82, 88], "hr_reserve": [76, 84]},
-        3: {
-            "name": "Long / medium-long",
-            "maximal_hr": [75, 84],
-            "hr_reserve": [66, 78],
-        },
-        4: {"name": "General aerobic", "maximal_hr": [72, 81], "hr_reserve": [62, 75]},
-        5: {"name": "Recovery", "maximal_hr": [0, 76], "hr_reserve": [0, 68]},
-    }
+    workouts_to_hr = WORKOUTS_TO_HR
 
     col1 = "Workouts"
     col2 = "Maximal HR ranges"
@@ -71,6 +104,104 @@ def print_pfitz_hr_ranges(max_hr: int, resting_hr: int, table_type: str):
     print(tabulate(df, headers="keys", tablefmt=table_type, showindex=False))
 
 
+def zone_boundaries(max_hr, resting_hr, method):
+    """BPM boundaries between consecutive ZONES by "maximal_hr" or
+    "hr_reserve" %. The book's ranges overlap, so each boundary is halfway
+    between the top of a zone's range & the bottom of the next one's."""
+    bands = [WORKOUTS_TO_HR[i][method] for i in reversed(range(len(WORKOUTS_TO_HR)))]
+    np = require_numpy("--streams")
+    percents = [(lower[1] + upper[0]) / 2 for lower, upper in pairwise(bands)]
+    base = resting_hr if method == "hr_reserve" else 0
+    return np.array([base + (max_hr - base) * pct / 100 for pct in percents])
+
+
+def _fit_heart_rate(path):
+    """Heart-rate samples of a .fit file & the seconds each one lasts, as
+    watches record every 1 to ~7 seconds."""
+    from fit import read_fit
+
+    np = require_numpy("--streams")
+    record = read_fit(path).get("record", {})
+    timestamps = record.get("timestamp", ())
+    if "heart_rate" not in record or not len(timestamps):
+        return np.empty(0), np.empty(0)
+    seconds = np.clip(np.diff(timestamps, append=timestamps[-1] + 1), 0, MAX_SAMPLE_GAP)
+    return record["heart_rate"], np.nan_to_num(seconds)
+
+
+def time_in_zones(path, boundaries, column="heart_rate", sample_seconds=1.0):
+    """Seconds spent in each of ZONES over a heart-rate stream: a .fit file,
+    or a CSV file with a sample every `sample_seconds` in `column`. Missing
+    & zero samples (e.g. strap dropouts) are skipped. Raises ValueError on a
+    missing column, a non-numeric sample, or an invalid .fit file."""
+    np = require_numpy("--streams")
+    if Path(path).suffix.lower() == ".fit":
+        hr, seconds = _fit_heart_rate(path)
+    else:
+        try:
+            hr = pd.read_csv(path, usecols=[column])[column]
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from None
+        hr = hr.to_numpy(dtype=np.float64)
+        seconds = None
+    valid = hr > 0
+    zones = np.searchsorted(boundaries, hr[valid], side="right")
+    if seconds is None:
+        return np.bincount(zones, minlength=len(ZONES)) * sample_seconds
+    return np.bincount(zones, weights=seconds[valid], minlength=len(ZONES))
+
+
+def _stream_paths(paths):
+    """Files, & every .csv & .fit file under directories, sorted."""
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(
+                sorted(
+                    p for p in path.rglob("*") if p.suffix.lower() in STREAM_SUFFIXES
+                )
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def zone_summary(paths, boundaries, column="heart_rate", sample_seconds=1.0, jobs=1):
+    """Time in each zone (seconds) per activity file, with a row per file &
+    a column per zone, plus a "Total" row. Files with no heart-rate samples
+    are left out. Files are read in `jobs` parallel processes."""
+    classify = functools.partial(
+        time_in_zones,
+        boundaries=boundaries,
+        column=column,
+        sample_seconds=sample_seconds,
+    )
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            rows = list(pool.map(classify, paths, chunksize=16))
+    else:
+        rows = list(map(classify, paths))
+    df = pd.DataFrame(rows, columns=ZONES, index=[str(path) for path in paths])
+    df = df[df.sum(axis=1) > 0]
+    df.loc["Total"] = df.sum()
+    df.insert(0, "Time", df.sum(axis=1))
+    df.index.name = "Activity"
+    return df
+
+
+def format_zone_summary(df):
+    """`zone_summary()` with times as H:MM:SS & zones as "H:MM:SS (NN%)"."""
+    out = pd.DataFrame(index=df.index)
+    out["Time"] = [format_duration(round(t)) for t in df["Time"]]
+    for zone in ZONES:
+        shares = df[zone] / df["Time"].where(df["Time"] > 0) * 100
+        out[zone] = [
+            f"{format_duration(round(t))} ({share:.0f}%)"
+            for t, share in zip(df[zone], shares.fillna(0))
+        ]
+    return out
+
+
 if __name__ == "__main__":
     default_max_hr = 194
     default_resting_hr = 50
@@ -92,10 +223,82 @@ if __name__ == "__main__":
         choices=["grid", "pipe", "html", "plain"],
         help="Table type from {grid, pipe, html, plain}",
     )
+    parser.add_argument(
+        "-s",
+        "--streams",
+        type=Path,
+        nargs="+",
+        metavar="PATH",
+        help="Print time in zone for these CSV or .fit heart-rate streams (or directories of them)",
+    )
+    parser.add_argument(
+        "--method",
+        choices=["maximal_hr", "hr_reserve"],
+        default="maximal_hr",
+        help="Zone ranges for --streams (default: maximal_hr)",
+    )
+    parser.add_argument(
+        "--column",
+        default="heart_rate",
+        help="Heart-rate column of --streams (default: heart_rate)",
+    )
+    parser.add_argument(
+        "--sample-seconds",
+        type=float,
+        default=1.0,
+        help="Seconds between samples of CSV --streams (default: 1, i.e. 1 Hz)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Streams to read in parallel (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="Write time in zone (seconds) for --streams to this .csv or .json file instead",
+    )
 
     args = parser.parse_args()
     max_hr = args.max
     resting_hr = args.resting
     table_type = args.table
 
-    print_pfitz_hr_ranges(max_hr, resting_hr, table_type)
+    if not args.streams:
+        print_pfitz_hr_ranges(max_hr, resting_hr, table_type)
+        sys.exit()
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    if args.sample_seconds <= 0:
+        parser.error("--sample-seconds must be more than 0")
+
+    paths = _stream_paths(args.streams)
+    if not paths:
+        print("Error: no .csv or .fit files found")
+        sys.exit(1)
+    boundaries = zone_boundaries(max_hr, resting_hr, args.method)
+    try:
+        df = zone_summary(
+            paths, boundaries, args.column, args.sample_seconds, args.jobs
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    for path in paths:
+        if str(path) not in df.index:
+            print(f"Skipping {path}: no heart-rate samples")
+
+    if args.output and args.output.suffix.lower() == ".json":
+        df.reset_index().to_json(args.output, orient="records", indent=2)
+    elif args.output:
+        df.to_csv(args.output)
+    if args.output:
+        print(f"Wrote time in zone for {len(df) - 1} activities to {args.output}")
+    else:
+        print(
+            f"Time in zone by {args.method.replace('_', ' ')} with max HR = {max_hr}, resting HR = {resting_hr}\n"
+        )
+        print(tabulate(format_zone_summary(df), headers="keys", tablefmt=table_type))
@@ -4,20 +4,75 @@ given time. Supports 5k, 10k, 15k, 10M, HM, FM distances.
 
 Usage:
     python precise_race_splits.py -t <time> -d <distance>
+    python precise_race_splits.py --table <from> <to> [--step 0:30] [-d 5k 10k ...]
+    python precise_race_splits.py --pace-table <from> <to> [--step 0:05] [--format csv] [-o chart.csv]
+    python precise_race_splits.py --course <file.gpx> -t <time> [-d FM] [--splits km] [--negative-split 2]
+    python precise_race_splits.py --course <file.gpx> -t <time> --actual <race.fit>
     python precise_race_splits.py -h
+
+`--table` prints a pace chart: the splits needed for every goal time from
+<from> to <to> (every `--step`) at every distance (or just the `-d` ones).
+`--pace-table` solves the other way, from pace per mile to finish time.
+Either grid is computed at once with NumPy. Tables are printed as Markdown,
+or written as CSV, Markdown, or JSON, & each generated table is cached on
+disk (under $XDG_CACHE_HOME or ~/.cache), keyed by the grid parameters &
+format, so reprinting a chart is instant. Only the most recently used
+CACHE_MAX_TABLES tables are kept.
+
+`--course` plans per-mile (or per-km) splits for a GPX, TCX, or FIT file:
+uphill splits get more time & downhill ones less (about +3.3% pace per 1%
+uphill grade & -1.8% per 1% downhill), optionally with a negative split
+(the second half a given % faster than the first), all adding up to the
+goal time. With `-d`, the track is scaled to the exact race distance, as
+GPS tracks run a little long or short. `--actual` adds the splits actually
+run in a .fit activity (by the watch's distance) & how far off plan each was.
+
+Dependencies for tables & courses: `pip install numpy`
 """
 
 import argparse
-import re
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+from pathlib import Path
+import sys
 
+from cli import duration_arg, require_numpy
+from durations import format_duration, parse_duration
 
-def _valid_time_format(value):
-    pattern = re.compile(r"^(?:(\d{1,2}):)?([0-5]?\d):([0-5]?\d)$")
-    if not pattern.match(value):
-        raise argparse.ArgumentTypeError(
-            f"Invalid time format: '{value}'. Expected 'HH:MM:SS' or 'MM:SS'."
-        )
-    return value
+
+DISTANCES = ["5k", "10k", "15k", "10M", "HM", "FM"]
+
+TABLE_FORMATS = {".md": "md", ".csv": "csv", ".json": "json"}
+
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / "precise_race_splits"
+)
+
+METERS_PER_MILE = 1609.344
+
+SPLIT_UNITS = {"mi": METERS_PER_MILE, "km": 1000}
+
+# Elevation is sampled this often (meters) along a course, which smooths out
+# GPS elevation noise between nearby points
+RESAMPLE_M = 50
+
+# Pace cost per unit of grade: +3.3% per 1% uphill, -1.8% per 1% downhill
+UPHILL_COST = 3.3
+DOWNHILL_GAIN = 1.8
+
+# Grades beyond this are treated as GPS glitches
+MAX_GRADE = 0.3
+
+# Bump when the table layout changes, so stale cached tables aren't used
+CACHE_VERSION = 1
+
+# Cached tables kept; the least recently used are deleted beyond this
+CACHE_MAX_TABLES = 100
 
 
 def _distance_to_miles(distance: str) -> float:
@@ -56,12 +111,7 @@ def print_precise_splits(time: str, distance: str):
     """
     Assumes inputs are well-formed & valid.
     """
-    time_split = time.split(":")
-    total_seconds = int(time_split[-1])
-    if len(time_split) == 3:
-        total_seconds += int(time_split[0]) * 3600 + int(time_split[1]) * 60
-    elif len(time_split) == 2:
-        total_seconds += int(time_split[0]) * 60
+    total_seconds = parse_duration(time)
 
     distance_miles = _distance_to_miles(distance)
     pace_seconds = total_seconds / distance_miles
@@ -80,6 +130,247 @@ def print_precise_splits(time: str, distance: str):
     )
 
 
+def duration_range(start, end, step):
+    """Seconds from `start` to `end` (inclusive) every `step`, as an array."""
+    np = require_numpy("tables")
+    count = int((end - start) // step) + 1
+    return start + step * np.arange(count)
+
+
+def pace_grid(times, distances):
+    """Pace (seconds per mile) for each goal time (rows) at each distance
+    (columns)."""
+    np = require_numpy("tables")
+    miles = np.array([_distance_to_miles(d) for d in distances])
+    return np.asarray(times, dtype=np.float64)[:, None] / miles
+
+
+def finish_grid(paces, distances):
+    """Finish time (seconds) for each pace per mile (rows) at each distance
+    (columns)."""
+    np = require_numpy("tables")
+    miles = np.array([_distance_to_miles(d) for d in distances])
+    return np.asarray(paces, dtype=np.float64)[:, None] * miles
+
+
+def _render(header, md_header, lines, fmt):
+    """Render rows of strings as a "md", "csv", or "json" table, with
+    `md_header` as the Markdown column names."""
+    if fmt == "json":
+        return json.dumps([dict(zip(header, line)) for line in lines], indent=2) + "\n"
+    if fmt == "csv":
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(lines)
+        return out.getvalue()
+    table = [md_header, ["---"] * len(md_header)] + lines
+    return "".join(f"| {' | '.join(line)} |\n" for line in table)
+
+
+def render_table(row_name, rows, grid, distances, fmt, row_decimals, cell_decimals):
+    """Render a grid (a row per `rows` value, a column per distance) of
+    durations as a "md", "csv", or "json" table."""
+    lines = [
+        [format_duration(row, row_decimals, short=True)]
+        + [format_duration(cell, cell_decimals, short=True) for cell in cells]
+        for row, cells in zip(rows.tolist(), grid.tolist())
+    ]
+    return _render(
+        [row_name] + distances,
+        [row_name.replace("_", " ")] + [_distance_to_string(d) for d in distances],
+        lines,
+        fmt,
+    )
+
+
+def pace_table(start, end, step, distances, fmt, reverse=False, cache_dir=CACHE_DIR):
+    """Return a pace chart from `start` to `end` every `step` (duration
+    strings): paces per mile for goal times or, if `reverse`, finish times
+    for paces per mile. Tables are cached in `cache_dir` unless it's None."""
+    params = {
+        "version": CACHE_VERSION,
+        "reverse": reverse,
+        "start": start,
+        "end": end,
+        "step": step,
+        "distances": distances,
+        "format": fmt,
+    }
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    cache_path = cache_dir / f"{key[:16]}.{fmt}" if cache_dir else None
+    if cache_path and cache_path.exists():
+        # Mark it as recently used, for `_evict_cached_tables()`
+        cache_path.touch()
+        return cache_path.read_text()
+
+    start, end, step = map(parse_duration, (start, end, step))
+    rows = duration_range(start, end, step)
+    row_decimals = 2 if any(isinstance(v, float) for v in (start, end, step)) else 0
+    if reverse:
+        grid = finish_grid(rows, distances)
+        text = render_table(
+            "pace_per_mile", rows, grid, distances, fmt, row_decimals, 0
+        )
+    else:
+        grid = pace_grid(rows, distances)
+        text = render_table("goal_time", rows, grid, distances, fmt, row_decimals, 2)
+
+    if cache_path:
+        # Write then rename, so a concurrent run never reads a partial table
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(text)
+        tmp_path.replace(cache_path)
+        _evict_cached_tables(cache_dir)
+    return text
+
+
+def _evict_cached_tables(cache_dir, keep=CACHE_MAX_TABLES):
+    """Delete all but the `keep` most recently used tables in `cache_dir`."""
+    tables = []
+    for path in cache_dir.iterdir():
+        if path.suffix[1:] in TABLE_FORMATS.values():
+            try:
+                tables.append((path.stat().st_mtime, path))
+            except FileNotFoundError:  # just evicted by a concurrent run
+                pass
+    tables.sort(reverse=True)
+    for _, path in tables[keep:]:
+        path.unlink(missing_ok=True)
+
+
+def effort_profile(meters, elevations, negative_split=0):
+    """Relative effort (time) for each stretch between consecutive `meters`
+    along a course: its length, scaled by the pace cost of its grade & by a
+    linear pace ramp making the second half `negative_split` (a fraction)
+    faster than the first."""
+    np = require_numpy("tables")
+    lengths = np.diff(meters)
+    grades = np.clip(
+        np.diff(elevations) / np.maximum(lengths, 1e-9), -MAX_GRADE, MAX_GRADE
+    )
+    cost = 1 + np.where(grades > 0, UPHILL_COST, DOWNHILL_GAIN) * grades
+    # 1 + a at the start down to 1 - a at the finish averages 1 + a/2 over
+    # the first half & 1 - a/2 over the second, whose ratio is 1 - split
+    a = 2 * negative_split / (2 - negative_split)
+    midpoints = (meters[:-1] + lengths / 2) / meters[-1]
+    return lengths * cost * (1 + a * (1 - 2 * midpoints))
+
+
+def actual_elapsed(path, marks):
+    """Elapsed seconds at each of `marks` (meters, by the watch's distance)
+    in a .fit activity, or NaN past its end."""
+    np = require_numpy("tables")
+    from fit import read_fit
+
+    record = read_fit(path).get("record", {})
+    if "timestamp" not in record or "distance" not in record:
+        raise ValueError(f"{path}: no timed distance records")
+    timestamps, meters = record["timestamp"], record["distance"]
+    known = ~(np.isnan(timestamps) | np.isnan(meters))
+    timestamps, meters = timestamps[known], meters[known]
+    if len(timestamps) < 2:
+        raise ValueError(f"{path}: fewer than 2 timed distance records")
+    # Watch distance can dip after a GPS correction
+    meters = np.maximum.accumulate(meters)
+    return np.interp(marks, meters, timestamps - timestamps[0], right=np.nan)
+
+
+def course_splits(
+    path,
+    time,
+    unit="mi",
+    distance=None,
+    negative_split=0,
+    elevation=True,
+    actual=None,
+):
+    """Plan splits every `unit` ("mi" or "km") over the course in a GPX,
+    TCX, or FIT file to finish in `time` (a duration string), scaling the
+    track to `distance` (e.g. "FM") if given. With `actual` (a .fit
+    activity), each split is compared with the one actually run.
+
+    Returns a list of records (dicts). Raises ValueError if the file can't
+    be read or has fewer than 2 distinct points.
+    """
+    np = require_numpy("tables")
+    from course import cumulative_distance, read_track
+
+    lat, lon, ele = read_track(path)
+    if len(lat) < 2:
+        raise ValueError(f"{path}: fewer than 2 track points")
+    meters = cumulative_distance(lat, lon)
+    if meters[-1] <= 0:
+        raise ValueError(f"{path}: the track has no length")
+    if distance:
+        meters *= _distance_to_miles(distance) * METERS_PER_MILE / meters[-1]
+    total = meters[-1]
+
+    known = ~np.isnan(ele)
+    samples = np.append(np.arange(0, total, RESAMPLE_M), total)
+    if elevation and known.any():
+        heights = np.interp(samples, meters[known], ele[known])
+    else:
+        heights = np.zeros_like(samples)
+
+    effort = effort_profile(samples, heights, negative_split)
+    elapsed = np.concatenate(([0.0], np.cumsum(effort)))
+    elapsed *= parse_duration(time) / elapsed[-1]
+    climbs = np.diff(heights)
+    gain = np.concatenate(([0.0], np.cumsum(np.maximum(climbs, 0))))
+    loss = np.concatenate(([0.0], np.cumsum(np.maximum(-climbs, 0))))
+
+    split_m = SPLIT_UNITS[unit]
+    marks = np.append(np.arange(0, total, split_m), total)
+    at_marks = [np.interp(marks, samples, v) for v in (elapsed, gain, loss)]
+    split_times, split_gain, split_loss = (np.diff(v) for v in at_marks)
+    lengths = np.diff(marks) / split_m
+    if actual:
+        actual_times = np.diff(actual_elapsed(actual, marks))
+
+    records = []
+    for i in range(len(lengths)):
+        records.append(
+            {
+                "split": i + 1,
+                unit: f"{marks[i + 1] / split_m:.2f}",
+                "gain_m": round(float(split_gain[i])),
+                "loss_m": round(float(split_loss[i])),
+                "split_time": format_duration(float(split_times[i]), 1, short=True),
+                f"pace_per_{unit}": format_duration(
+                    float(split_times[i] / lengths[i]), 1, short=True
+                ),
+                "elapsed": format_duration(float(at_marks[0][i + 1]), 0),
+            }
+        )
+        if actual:
+            actual_time = float(actual_times[i])
+            difference = actual_time - float(split_times[i])
+            sign = "+" if difference >= 0 else "-"
+            known = not math.isnan(actual_time)
+            records[-1]["actual"] = (
+                format_duration(actual_time, 1, short=True) if known else None
+            )
+            records[-1]["difference"] = (
+                sign + format_duration(abs(difference), 1, short=True)
+                if known
+                else None
+            )
+    return records
+
+
+def render_records(records, fmt):
+    """Render `course_splits()` records as a "md", "csv", or "json" table."""
+    header = list(records[0])
+    if fmt == "json":
+        return json.dumps(records, indent=2) + "\n"
+    lines = [
+        ["" if v is None else str(v) for v in record.values()] for record in records
+    ]
+    return _render(header, [h.replace("_", " ") for h in header], lines, fmt)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="A script to print out precise average splits for various race distances in given time."
@@ -87,18 +378,141 @@ if __name__ == "__main__":
     parser.add_argument(
         "-t",
         "--time",
-        type=_valid_time_format,
-        help='Goal time ("HH:MM:SS" or "MM:SS")',
-        required=True,
+        type=duration_arg,
+        help='Goal time ("H:MM:SS" or "MM:SS", optionally with fractional seconds)',
     )
     parser.add_argument(
         "-d",
         "--distance",
         type=str,
-        choices=["5k", "10k", "15k", "10M", "HM", "FM"],
-        help="Race distance (5k, 10k, 15k, 10M, HM, FM)",
-        required=True,
+        nargs="+",
+        choices=DISTANCES,
+        help="Race distance (5k, 10k, 15k, 10M, HM, FM); tables can take several (default: all)",
+    )
+    tables = parser.add_mutually_exclusive_group()
+    tables.add_argument(
+        "--table",
+        nargs=2,
+        type=duration_arg,
+        metavar=("FROM", "TO"),
+        help="Print the splits for every goal time from FROM to TO",
+    )
+    tables.add_argument(
+        "--pace-table",
+        nargs=2,
+        type=duration_arg,
+        metavar=("FROM", "TO"),
+        help="Print the finish times for every pace per mile from FROM to TO",
+    )
+    tables.add_argument(
+        "--course",
+        type=Path,
+        metavar="FILE",
+        help="Plan splits to run -t/--time over the course in a .gpx, .tcx, or .fit file",
+    )
+    parser.add_argument(
+        "--step",
+        type=duration_arg,
+        help="Table step (default: 1:00 for --table, 0:05 for --pace-table)",
+    )
+    parser.add_argument(
+        "--splits",
+        choices=sorted(SPLIT_UNITS),
+        default="mi",
+        help="Course split length (default: mi)",
+    )
+    parser.add_argument(
+        "--negative-split",
+        type=float,
+        default=0,
+        metavar="PCT",
+        help="Run the second half of a course PCT%% faster than the first (default: 0)",
+    )
+    parser.add_argument(
+        "--flat",
+        action="store_true",
+        help="Ignore course elevation, for even splits",
+    )
+    parser.add_argument(
+        "--actual",
+        type=Path,
+        metavar="FILE",
+        help="Compare each --course split with the one run in this .fit activity",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(set(TABLE_FORMATS.values())),
+        help="Table format (default: from --output's suffix, else md)",
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, help="Write the table to this file instead"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Don't read or write cached tables in {CACHE_DIR}",
     )
 
     args = parser.parse_args()
-    print_precise_splits(args.time, args.distance)
+    table_range = args.table or args.pace_table
+    fmt = args.format
+    if fmt is None:
+        suffix = args.output.suffix.lower() if args.output else ""
+        fmt = TABLE_FORMATS.get(suffix, "md")
+
+    if not (table_range or args.course):
+        if args.time is None or args.distance is None:
+            parser.error("-t/--time & -d/--distance are required without a table")
+        if len(args.distance) > 1:
+            parser.error("give one -d/--distance without a table")
+        print_precise_splits(args.time, args.distance[0])
+        sys.exit()
+
+    if args.actual and not args.course:
+        parser.error("--actual requires --course")
+    if args.course:
+        if args.time is None:
+            parser.error("-t/--time is required with --course")
+        if args.distance and len(args.distance) > 1:
+            parser.error("give one -d/--distance with --course")
+        if not 0 <= args.negative_split < 50:
+            parser.error("--negative-split must be from 0 up to 50")
+        try:
+            records = course_splits(
+                args.course,
+                args.time,
+                args.splits,
+                args.distance[0] if args.distance else None,
+                args.negative_split / 100,
+                elevation=not args.flat,
+                actual=args.actual,
+            )
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        text = render_records(records, fmt)
+    else:
+        if args.time is not None:
+            parser.error("-t/--time can't be combined with a table")
+        start, end = table_range
+        step = args.step or ("1:00" if args.table else "0:05")
+        if parse_duration(step) <= 0:
+            parser.error("--step must be more than 0")
+        if parse_duration(end) < parse_duration(start):
+            parser.error(f"{end} is before {start}")
+
+        text = pace_table(
+            start,
+            end,
+            step,
+            args.distance or DISTANCES,
+            fmt,
+            reverse=bool(args.pace_table),
+            cache_dir=None if args.no_cache else CACHE_DIR,
+        )
+
+    if args.output:
+        args.output.write_text(text)
+        print(f"Wrote {fmt} table to {args.output}")
+    else:
+        print(text, end="")
@@ -0,0 +1,203 @@
+"""
+Predict equivalent race times at other distances with Riegel's formula,
+T2 = T1 × (D2 / D1) ^ k, where k (the fatigue exponent) is 1.06 by default.
+
+Usage:
+    python race_predictor.py <time> <distance> [-k 1.06]
+    python race_predictor.py 1:25:00 HM
+    python race_predictor.py --results results.csv [-o predictions.csv] [-k 1.08]
+
+`--results` reads a .csv (or .json) file of athlete, distance & time rows,
+e.g. a club's race results, & predicts every distance (5k, 10k, 15k, 10M,
+HM, FM, as in precise_race_splits.py) for every athlete in one vectorized
+pass. Each athlete's predictions come from their best result, i.e. the one
+that predicts the fastest times, which is shown as the basis.
+
+Dependencies for `--results`: `pip install numpy`
+"""
+
+import argparse
+import csv
+import json
+from operator import itemgetter
+from pathlib import Path
+import sys
+
+from cli import duration_arg, print_records, require_numpy, write_records
+from durations import format_duration, parse_duration, parse_durations
+from precise_race_splits import DISTANCES, _distance_to_miles
+
+
+RIEGEL_EXPONENT = 1.06
+
+RESULT_COLUMNS = ["athlete", "distance", "time"]
+
+
+def riegel(time, from_miles, to_miles, exponent=RIEGEL_EXPONENT):
+    """Predicted time (seconds) over `to_miles` for `time` (seconds) over
+    `from_miles`. Works elementwise on NumPy arrays too."""
+    return time * (to_miles / from_miles) ** exponent
+
+
+def load_results(path):
+    """Read athlete, distance & time columns from a .csv or .json file.
+
+    Returns (athletes, distances, times) lists, with times in seconds.
+    Raises ValueError on a missing column or an invalid distance or time.
+    """
+    if path.suffix.lower() == ".json":
+        records = json.loads(path.read_text())
+        try:
+            columns = [[str(r[c]) for r in records] for c in RESULT_COLUMNS]
+        except KeyError as e:
+            raise ValueError(f"missing {e.args[0]!r}") from None
+    else:
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            missing = [c for c in RESULT_COLUMNS if c not in header]
+            if missing:
+                raise ValueError(f"missing column {missing[0]!r}")
+            get = itemgetter(*(header.index(c) for c in RESULT_COLUMNS))
+            try:
+                rows = list(map(get, filter(None, reader)))
+            except IndexError:
+                raise ValueError(f"row {reader.line_num}: too few columns") from None
+        columns = [list(column) for column in zip(*rows)] or [[], [], []]
+
+    athletes, distances, times = columns
+    unknown = set(distances).difference(DISTANCES)
+    if unknown:
+        raise ValueError(
+            f"Invalid distance: {min(unknown)!r}. Expected one of {', '.join(DISTANCES)}."
+        )
+    return athletes, distances, parse_durations(times)
+
+
+def predict_results(athletes, distances, times, targets, exponent=RIEGEL_EXPONENT):
+    """Predict each athlete's time at each of `targets` from their best
+    result.
+
+    Returns (names, basis, grid): athlete names in first-seen order, the
+    index of each one's best result, & predicted seconds with a row per
+    athlete & a column per target.
+    """
+    np = require_numpy("--results")
+    # Athlete ids in first-seen order; a dict beats np.unique() on strings
+    ids_by_name = {}
+    ids = np.fromiter(
+        (ids_by_name.setdefault(a, len(ids_by_name)) for a in athletes),
+        dtype=np.intp,
+        count=len(athletes),
+    )
+    miles_by_distance = {d: _distance_to_miles(d) for d in DISTANCES}
+    miles = np.array([miles_by_distance[d] for d in distances])
+    # Equivalent time over 1 mile: the lower, the better the result
+    scores = riegel(np.asarray(times, dtype=np.float64), miles, 1.0, exponent)
+
+    order = np.lexsort((scores, ids))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ids[order][1:] != ids[order][:-1]
+    basis = order[first]
+
+    target_miles = np.array([miles_by_distance[d] for d in targets])
+    grid = riegel(scores[basis, None], 1.0, target_miles, exponent)
+    return list(ids_by_name), basis, grid
+
+
+def predictions_to_records(names, basis, grid, distances, times, targets):
+    """JSON/CSV-friendly dicts of `predict_results()`, one per athlete."""
+    records = []
+    for name, i, row in zip(names, basis.tolist(), grid.tolist()):
+        record = {
+            "athlete": name,
+            "basis": f"{distances[i]} {format_duration(times[i])}",
+        }
+        record.update(
+            (target, format_duration(seconds, 0))
+            for target, seconds in zip(targets, row)
+        )
+        records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Predict equivalent race times at other distances with Riegel's formula."
+    )
+    parser.add_argument(
+        "time",
+        nargs="?",
+        type=duration_arg,
+        help='Race time ("H:MM:SS" or "MM:SS")',
+    )
+    parser.add_argument("distance", nargs="?", choices=DISTANCES, help="Race distance")
+    parser.add_argument(
+        "--results",
+        type=Path,
+        help="Predict for every athlete in this .csv or .json file of athlete, distance & time",
+    )
+    parser.add_argument(
+        "-k",
+        "--exponent",
+        type=float,
+        default=RIEGEL_EXPONENT,
+        help=f"Fatigue exponent (default: {RIEGEL_EXPONENT})",
+    )
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        choices=DISTANCES,
+        default=DISTANCES,
+        help="Distances to predict (default: all)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="With --results, write predictions to this .csv or .json file instead",
+    )
+    args = parser.parse_args()
+    if args.exponent <= 0:
+        parser.error("--exponent must be more than 0")
+
+    if args.results is None:
+        if args.time is None or args.distance is None:
+            parser.error("give a time & distance, or --results")
+        seconds = parse_duration(args.time)
+        from_miles = _distance_to_miles(args.distance)
+        records = []
+        for target in args.targets:
+            predicted = riegel(
+                seconds, from_miles, _distance_to_miles(target), args.exponent
+            )
+            records.append(
+                {"distance": target, "predicted_time": format_duration(predicted, 0)}
+            )
+        print_records(records)
+        return
+    if args.time is not None:
+        parser.error("a time & distance can't be combined with --results")
+
+    try:
+        athletes, distances, times = load_results(args.results)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not read {args.results}: {e}")
+        sys.exit(1)
+    if not athletes:
+        print(f"Error: no results in {args.results}")
+        sys.exit(1)
+
+    names, basis, grid = predict_results(
+        athletes, distances, times, args.targets, args.exponent
+    )
+    records = predictions_to_records(names, basis, grid, distances, times, args.targets)
+    if args.output:
+        write_records(records, args.output)
+        print(f"Wrote predictions for {len(records)} athlete(s) to {args.output}")
+    else:
+        print_records(records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Tests for fit.py: `python -m pytest fitness`
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from fit import FIT_EPOCH, MESSAGES, read_fit
+
+
+def _definition(local, message, fields, developer_fields=()):
+    """A little-endian definition message of (number, size, base type)
+    fields, with developer fields of (number, size) if any."""
+    header = 0x40 | local | (0x20 if developer_fields else 0)
+    data = bytes([header, 0, 0]) + struct.pack("<H", MESSAGES[message])
+    data += bytes([len(fields)]) + b"".join(bytes(field) for field in fields)
+    if developer_fields:
+        data += bytes([len(developer_fields)])
+        data += b"".join(bytes([number, size, 0]) for number, size in developer_fields)
+    return data
+
+
+def _fit_file(path, data):
+    """Write `data` (messages) as a .fit file, with a 14-byte header. CRCs
+    are zeros, as read_fit() doesn't check them."""
+    header = struct.pack("<BBHI4sH", 14, 0x10, 2100, len(data), b".FIT", 0)
+    path.write_bytes(header + data + b"\0\0")
+
+
+def _records(heart_rates, start=1_000_000_000):
+    """A record definition & a 1 Hz record message per heart rate."""
+    data = _definition(0, "record", [(253, 4, 0x86), (3, 1, 0x02)])
+    for i, hr in enumerate(heart_rates):
+        data += bytes([0]) + struct.pack("<IB", start + i, hr)
+    return data
+
+
+def test_reads_records(tmp_path):
+    path = tmp_path / "run.fit"
+    _fit_file(path, _records([120, 130, 0xFF]))
+    record = read_fit(path)["record"]
+    np.testing.assert_array_equal(record["heart_rate"], [120, 130, np.nan])
+    assert record["timestamp"][0] == 1_000_000_000 + FIT_EPOCH
+
+
+@pytest.mark.parametrize("developer_fields", [(), ((0, 2),)])
+def test_truncated_inside_definition(tmp_path, developer_fields):
+    """A file cut off inside a definition keeps the messages before it."""
+    records = _records([120, 130, 140])
+    lap = _definition(1, "lap", [(253, 4, 0x86), (7, 4, 0x86)], developer_fields)
+    for cut in range(1, len(lap)):
+        path = tmp_path / f"cut{cut}.fit"
+        _fit_file(path, records + lap[:cut])
+        activity = read_fit(path)
+        np.testing.assert_array_equal(activity["record"]["heart_rate"], [120, 130, 140])
+        assert "lap" not in activity
@@ -0,0 +1,41 @@
+"""
+Tests for one_rep_max.py: `python -m pytest fitness`
+"""
+
+import numpy as np
+import pytest
+
+from one_rep_max import (
+    ESTIMATORS,
+    REP_TABLE_MAX,
+    estimate_1rm,
+    estimate_1rm_batch,
+)
+
+
+@pytest.mark.parametrize("formula", ESTIMATORS)
+@pytest.mark.parametrize("reps", [0, 1, 5, 12.5, REP_TABLE_MAX])
+def test_batch_matches_scalar(formula, reps):
+    batch = estimate_1rm_batch([100.0], [reps], formula)
+    assert batch[0] == pytest.approx(estimate_1rm(100.0, reps, formula))
+
+
+@pytest.mark.parametrize("formula", ESTIMATORS)
+def test_zero_reps_estimates_the_weight(formula):
+    assert estimate_1rm(150.0, 0, formula) == 150.0
+    assert estimate_1rm_batch([150.0], [0], formula)[0] == 150.0
+
+
+@pytest.mark.parametrize("formula", ESTIMATORS)
+@pytest.mark.parametrize("reps", [-1, 36, 37, 40])
+def test_reps_outside_table_raise(formula, reps):
+    with pytest.raises(ValueError, match="Reps must be from 0 to"):
+        estimate_1rm(100.0, reps, formula)
+    with pytest.raises(ValueError, match="Reps must be from 0 to"):
+        estimate_1rm_batch([100.0, 100.0], [5, reps], formula)
+
+
+def test_batch_broadcasts_weights():
+    estimates = estimate_1rm_batch(100.0, np.arange(REP_TABLE_MAX + 1), "median")
+    assert estimates.shape == (REP_TABLE_MAX + 1,)
+    assert np.all(np.diff(estimates) > 0)
@@ -0,0 +1,135 @@
+"""
+ANSI-aware text wrapping, for juggernaut.py's colored explanations (the other
+fitness scripts print tables, which don't wrap).
+
+`textwrap` counts ANSI escape codes (i.e. colors) toward line length, so
+colored text wraps early. These functions measure only visible characters,
+leave codes where they are, & work in a single pass over the text, so
+wrapping thousands of paragraphs stays linear in their total length.
+
+Usage:
+    from text_layout import fill, fill_bullets
+
+    print(fill(colored_text, width=80))
+    print(fill_bullets(heading, bullets, width=100))
+"""
+
+import re
+
+
+# ANSI SGR escape codes, e.g. "\033[1m" or "\033[38;5;208m"
+ANSI_RE = re.compile(r"\033\[[0-9;]*m")
+
+# Splits text into alternating plain text & ANSI codes
+ANSI_SPLIT_RE = re.compile(r"(\033\[[0-9;]*m)")
+
+# A run of whitespace & the word after it; ANSI codes never contain
+# whitespace, so they always stay inside a word
+WORD_RE = re.compile(r"(\s*)(\S+)")
+
+
+def visible_len(text):
+    """Return the length of text, not counting ANSI codes."""
+    return len(text) - sum(len(code) for code in ANSI_RE.findall(text))
+
+
+def strip_ansi(text):
+    """Return text with ANSI codes removed."""
+    return ANSI_RE.sub("", text)
+
+
+def expand_tabs(text, tabsize=8):
+    """Like `str.expandtabs()`, but ANSI codes take up no columns."""
+    if "\t" not in text:
+        return text
+    parts = []
+    column = 0
+    for i, segment in enumerate(ANSI_SPLIT_RE.split(text)):
+        if i % 2:
+            parts.append(segment)
+            continue
+        for j, piece in enumerate(segment.split("\t")):
+            if j:
+                spaces = tabsize - column % tabsize
+                parts.append(" " * spaces)
+                column += spaces
+            parts.append(piece)
+            line_break = max(piece.rfind("\n"), piece.rfind("\r"))
+            if line_break >= 0:
+                column = len(piece) - line_break - 1
+            else:
+                column += len(piece)
+    return "".join(parts)
+
+
+def wrap(text, width, initial_indent="", subsequent_indent=""):
+    """Wrap text into lines of at most `width` visible characters.
+
+    Like `textwrap.wrap()`: tabs are expanded to every 8th column, lines
+    break at whitespace, whitespace at line breaks is dropped, other
+    whitespace characters become spaces, & words longer than a line are
+    broken. Returns a list of lines (without newlines).
+    """
+    text = expand_tabs(text)
+    lines = []
+    parts = [initial_indent]
+    indent_len = visible_len(initial_indent)
+    length = indent_len
+
+    for match in WORD_RE.finditer(text):
+        separator, word = match.groups()
+        word_len = visible_len(word)
+        # A word too long for any line starts on this one if there's room
+        fits = length + len(separator) + word_len <= width or (
+            word_len > width - indent_len and length + len(separator) < width
+        )
+        if length > indent_len:
+            if not fits:
+                lines.append("".join(parts))
+                parts = [subsequent_indent]
+                indent_len = length = visible_len(subsequent_indent)
+            else:
+                parts.append(" " * len(separator))
+                length += len(separator)
+        elif not lines and fits:
+            # Like textwrap, keep whitespace at the start of the text
+            parts.append(" " * len(separator))
+            length += len(separator)
+
+        if length + word_len <= width:
+            parts.append(word)
+            length += word_len
+            continue
+        # Too long even for an empty line: break it across lines, keeping
+        # ANSI codes (the odd segments) whole
+        for i, segment in enumerate(ANSI_SPLIT_RE.split(word)):
+            if i % 2:
+                parts.append(segment)
+                continue
+            while segment:
+                if length >= width and length > indent_len:
+                    lines.append("".join(parts))
+                    parts = [subsequent_indent]
+                    indent_len = length = visible_len(subsequent_indent)
+                take = max(width - length, 1)
+                parts.append(segment[:take])
+                length += len(segment[:take])
+                segment = segment[take:]
+
+    if length > indent_len:
+        lines.append("".join(parts))
+    return lines
+
+
+def fill(text, width, initial_indent="", subsequent_indent=""):
+    """Like `wrap()`, but returns a single string with newlines."""
+    return "\n".join(wrap(text, width, initial_indent, subsequent_indent))
+
+
+def fill_bullets(heading, bullets, width, indent="  ", subsequent_indent="    "):
+    """Wrap a heading followed by bullet paragraphs, each bullet indented by
+    `indent` & further indented by `subsequent_indent` when it wraps."""
+    paragraphs = [fill(heading, width)]
+    for bullet in bullets:
+        paragraphs.append(fill(bullet, width, indent, subsequent_indent))
+    return "\n".join(paragraphs)
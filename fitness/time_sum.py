@@ -1,54 +1,253 @@
 """
-Sum multiple time values provided as command line arguments.
+Sum multiple time values provided as command line arguments, files, or stdin.
 
 Accepts time strings in various formats:
 - Seconds only: "45"
 - Minutes:seconds: "13:45"
 - Hours:minutes:seconds: "1:22:57"
+- Any of the above with fractional seconds: "1:23.45"
 
-Outputs the total time in H:MM:SS format.
+Fields after the first must be under 60 (see durations.py, which parses &
+formats times for all the fitness scripts).
+
+Outputs the total time in H:MM:SS format (to hundredths of a second if any
+time has a fractional part).
 
 Usage:
     python time_sum.py <time1> <time2> [time3] ...
     python time_sum.py 13 13:14 1:22:57
+    python time_sum.py --files laps1.txt laps2.txt [--jobs 4] [--numpy]
+    some_command | python time_sum.py --stdin
+    python time_sum.py --stats --files laps.txt
+    python time_sum.py --files runs.csv --column duration --group-by athlete [--output stats.json]
+    python time_sum.py --fit activities/*.fit [--stats]
 
 Examples:
     python time_sum.py 30 45        # 30s + 45s = 0:01:15
     python time_sum.py 5:30 2:45    # 5m30s + 2m45s = 0:08:15
     python time_sum.py 1:30:00 45:30 15  # 1h30m + 45m30s + 15s = 2:15:45
+
+Files & stdin hold whitespace-separated times (typically one per line) & are
+streamed in fixed-size chunks by durations.py, so memory use doesn't grow with
+input size, & multiple files are summed in parallel processes. `--numpy`
+parses each chunk with vectorized NumPy operations instead, which is several
+times faster for large files of whole-second times.
+
+`--stats` reports count, total, mean, min, p50/p90/p99 & max instead. With
+`--column`, files & stdin are read as CSV with a header row, taking times
+from that column, & `--group-by` reports stats per athlete, workout type,
+week, or any other column. Stats are computed in one streaming pass with
+memory bounded by the number of groups: percentiles are approximate (within
+1%, see `DurationStats`), & stats of files read in parallel are merged.
+
+`--fit` adds the lap times (timer time, i.e. without pauses) of .fit
+activity files, decoded in parallel by fit.py.
+
+Dependencies for `--numpy` & `--fit`: `pip install numpy`
 """
 
-import sys
+import argparse
 from datetime import timedelta
+import math
+import os
+from pathlib import Path
+import sys
+
+from cli import print_records, require_numpy, write_records
+from durations import (
+    DurationStats,
+    format_duration,
+    merge_groups,
+    parse_duration,
+    parse_durations,
+    stats_files,
+    stats_stream,
+    sum_durations,
+    sum_files,
+    sum_stream,
+)
+
+
+# Percentiles reported with --stats
+PERCENTILES = [50, 90, 99]
 
 
 def parse_time_string(s):
-    parts = list(map(int, s.split(":")))
-    if len(parts) == 1:
-        return timedelta(seconds=parts[0])
-    elif len(parts) == 2:
-        return timedelta(minutes=parts[0], seconds=parts[1])
-    elif len(parts) == 3:
-        return timedelta(hours=parts[0], minutes=parts[1], seconds=parts[2])
-    else:
-        raise ValueError(f"Invalid time string: {s}")
+    return timedelta(seconds=parse_duration(s))
+
+
+def fit_lap_times(paths, jobs):
+    """Lap times (seconds of timer time) of .fit activity files, decoded in
+    `jobs` parallel processes."""
+    require_numpy("--fit")
+    from fit import read_fits
+
+    times = []
+    for activity in read_fits(paths, jobs):
+        laps = activity.get("lap", {}).get("total_timer_time")
+        if laps is not None:
+            times.extend(t for t in laps.tolist() if not math.isnan(t))
+    return times
+
+
+def _group_order(key):
+    """Sort key for a group key, ordering numeric values (e.g. weeks 1, 2,
+    10) by number, before other text."""
+    order = []
+    for value in key:
+        try:
+            number = float(value)
+        except ValueError:
+            number = math.nan
+        order.append((0, number, value) if math.isfinite(number) else (1, 0, value))
+    return tuple(order)
+
+
+def stats_to_records(groups, group_by=(), as_seconds=False):
+    """One dict per group, sorted by key (see `_group_order()`): the
+    `group_by` columns, then count & duration stats. Durations are H:MM:SS strings (with hundredths if any
+    time had a fractional part), or seconds if `as_seconds`."""
+    decimals = 2 if any(isinstance(s.total, float) for s in groups.values()) else 0
+
+    def duration(seconds):
+        if seconds is None:
+            return None
+        return round(seconds, 3) if as_seconds else format_duration(seconds, decimals)
+
+    records = []
+    for key in sorted(groups, key=_group_order):
+        stats = groups[key]
+        record = dict(zip(group_by, key))
+        record["count"] = stats.count
+        record["total"] = duration(stats.total)
+        record["mean"] = duration(stats.mean())
+        record["min"] = duration(stats.min)
+        for percentile in PERCENTILES:
+            record[f"p{percentile}"] = duration(stats.quantile(percentile / 100))
+        record["max"] = duration(stats.max)
+        records.append(record)
+    return records
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python sum_times.py 13 13:14 1:22:57")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Sum time values (SS, MM:SS, or H:MM:SS) & print the total as H:MM:SS."
+    )
+    parser.add_argument("times", nargs="*", help="Time values, e.g. 13 13:14 1:22:57")
+    parser.add_argument(
+        "-f",
+        "--files",
+        nargs="+",
+        action="extend",
+        default=[],
+        metavar="FILE",
+        help="Files of whitespace-separated times to sum",
+    )
+    parser.add_argument(
+        "--stdin", action="store_true", help="Also sum times read from stdin"
+    )
+    parser.add_argument(
+        "--fit",
+        nargs="+",
+        action="extend",
+        default=[],
+        metavar="FILE",
+        help="Also sum the lap times of these .fit activity files",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Files to sum in parallel (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--numpy",
+        action="store_true",
+        help="Parse files & stdin with vectorized NumPy operations (faster for large inputs)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print count, total, mean, min, p50/p90/p99 & max instead of just the total",
+    )
+    parser.add_argument(
+        "--column",
+        help="Read files & stdin as CSV with a header row, taking times from this column (implies --stats)",
+    )
+    parser.add_argument(
+        "--group-by",
+        action="append",
+        default=[],
+        metavar="COLUMN",
+        help="With --column, report stats per value of this column (repeatable)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="Write stats to this .csv or .json file (durations in seconds) instead of printing (implies --stats)",
+    )
+    args = parser.parse_args()
+    if not (args.times or args.files or args.stdin or args.fit):
+        parser.error("give time values, --files, --stdin, or --fit")
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    if args.group_by and not args.column:
+        parser.error("--group-by requires --column")
+    if args.column and (args.times or args.fit):
+        parser.error("time values & --fit can't be combined with --column")
+    stats_mode = args.stats or args.column or args.output
+    if stats_mode and args.numpy:
+        parser.error("--numpy only applies to totals, not --stats")
+    if args.numpy:
+        require_numpy("--numpy")
 
-    total = timedelta()
-    for time_str in sys.argv[1:]:
-        total += parse_time_string(time_str)
+    try:
+        if stats_mode:
+            groups = {}
+            if args.times:
+                groups[()] = DurationStats()
+                groups[()].update(parse_durations(args.times))
+            if args.files:
+                merge_groups(
+                    groups,
+                    stats_files(args.files, args.jobs, args.column, args.group_by),
+                )
+            if args.stdin:
+                merge_groups(
+                    groups,
+                    stats_stream(
+                        sys.stdin.buffer, "<stdin>", args.column, args.group_by
+                    ),
+                )
+            if args.fit:
+                groups.setdefault((), DurationStats())
+                groups[()].update(fit_lap_times(args.fit, args.jobs))
+        else:
+            total = sum_durations(args.times)
+            if args.files:
+                total += sum_files(args.files, args.jobs, args.numpy)[0]
+            if args.stdin:
+                total += sum_stream(sys.stdin.buffer, "<stdin>", args.numpy)[0]
+            if args.fit:
+                total += sum(fit_lap_times(args.fit, args.jobs))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
-    # Format output as H:MM:SS (no leading zeros)
-    total_seconds = int(total.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-    print(f"{hours}:{minutes:02}:{seconds:02}")
+    if not stats_mode:
+        print(format_duration(total))
+    elif not groups:
+        print("Error: no times found")
+        sys.exit(1)
+    elif args.output:
+        write_records(
+            stats_to_records(groups, args.group_by, as_seconds=True), args.output
+        )
+        print(f"Wrote stats for {len(groups)} group(s) to {args.output}")
+    else:
+        print_records(stats_to_records(groups, args.group_by))
 
 
 if __name__ == "__main__":
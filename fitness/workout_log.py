@@ -0,0 +1,433 @@
+"""
+Streaming ingestion of workout logs into per-athlete, per-lift estimated 1RM
+(e1RM) history, which feeds juggernaut.py's working max calculation.
+
+Usage:
+    python workout_log.py ingest log.csv [more.jsonl ...] --state lifts.json
+    python workout_log.py show --state lifts.json
+    python workout_log.py maxes --state lifts.json [--output new_maxes.csv]
+
+Logs are CSV (with a header row) or JSONL (one object per line), one set per
+row, with `date` (ISO 8601, e.g. 2024-05-01), `athlete`, `lift`, `weight`, &
+`reps` fields, plus optional `amap` (true/1/yes for an AMAP set),
+`working_max`, & `standard_reps`. Rows are expected in date order.
+
+`ingest` reads each log from where the previous run stopped (the byte offset
+of each log is kept in the state file), so appending new sessions to a log &
+re-ingesting only reads the new lines. A trailing partial line is left for
+the next run. The state only holds a few numbers per athlete × lift, however
+long the logs are:
+  - the best set by e1RM,
+  - a rolling e1RM: an exponentially weighted moving average of each
+    session's best e1RM (`--alpha` weights the newest session),
+  - & the latest AMAP set, with its working max & standard reps.
+
+`maxes` runs every Juggernaut lift's latest AMAP set through
+`juggernaut.batch_new_working_maxes()` & prints (or writes) the new working
+maxes, like `juggernaut.py --batch`. Sets of more than 30 reps, past where
+the 1RM formulas hold up, give no e1RM, & such AMAP sets are skipped at
+`ingest`.
+
+Dependencies for `maxes`: `pip install numpy`
+"""
+
+import argparse
+import csv
+import functools
+import json
+import os
+from pathlib import Path
+import sys
+
+from cli import print_records, write_records
+from juggernaut import (
+    DEFAULT_FORMULA,
+    batch_new_working_maxes,
+    batch_results_to_records,
+    parse_lift,
+)
+from one_rep_max import ESTIMATORS, REP_TABLE_MAX, estimate_1rm
+
+
+STATE_VERSION = 1
+
+# Weight of the newest session in the rolling e1RM
+DEFAULT_ALPHA = 0.3
+
+TRUE_STRINGS = {"1", "true", "yes", "y", "t"}
+
+
+class LogState:
+    """Per-athlete, per-lift e1RM history, plus how far each log was read.
+
+    Saved as JSON. `lifts` maps "<athlete>\\t<lift>" to a dict of that
+    athlete's lift state; `sources` maps each log's resolved path to the byte
+    offset read up to (& its CSV header, if any).
+    """
+
+    def __init__(self, formula=DEFAULT_FORMULA, alpha=DEFAULT_ALPHA):
+        self.formula = formula
+        self.alpha = alpha
+        self.sources = {}
+        self.lifts = {}
+
+    @classmethod
+    def load(cls, path):
+        """Load state from path. Raises ValueError on an unsupported file."""
+        data = json.loads(path.read_text())
+        if data.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported state file version in {path}")
+        state = cls(data["formula"], data["alpha"])
+        state.sources = data["sources"]
+        state.lifts = data["lifts"]
+        return state
+
+    def save(self, path):
+        """Write the state atomically, so an interrupted save can't corrupt it."""
+        data = {
+            "version": STATE_VERSION,
+            "formula": self.formula,
+            "alpha": self.alpha,
+            "sources": self.sources,
+            "lifts": self.lifts,
+        }
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2) + "\n")
+        os.replace(tmp_path, path)
+
+    def add_set(self, record):
+        """Fold one logged set (a dict of log fields) into the state. Raises
+        ValueError (or KeyError for a missing field) on a malformed set."""
+        date = str(record["date"])
+        athlete = str(record["athlete"])
+        lift = _lift_key(str(record["lift"]))
+        weight = float(record["weight"])
+        reps = int(record["reps"])
+        if weight < 0 or reps < 0:
+            raise ValueError("weight & reps must be >= 0")
+        # Sets of more reps than the 1RM formulas hold up for (e.g. bodyweight
+        # sets) still count, but give no e1RM, like missed (0 rep) sets
+        if 0 < reps <= REP_TABLE_MAX:
+            e1rm = estimate_1rm(weight, reps, self.formula)
+        else:
+            e1rm = 0.0
+        amap = None
+        if str(record.get("amap", "")).strip().lower() in TRUE_STRINGS:
+            if reps > REP_TABLE_MAX:
+                raise ValueError(f"AMAP sets must be at most {REP_TABLE_MAX} reps")
+            working_max = record.get("working_max")
+            standard_reps = record.get("standard_reps")
+            amap = {
+                "date": date,
+                "weight": weight,
+                "reps": reps,
+                "working_max": None
+                if working_max in (None, "")
+                else float(working_max),
+                "standard_reps": None
+                if standard_reps in (None, "")
+                else int(standard_reps),
+            }
+        # Nothing is changed until the whole set has parsed
+
+        key = f"{athlete}\t{lift}"
+        entry = self.lifts.get(key)
+        if entry is None:
+            entry = self.lifts[key] = {
+                "athlete": athlete,
+                "lift": lift,
+                "sets": 0,
+                "best": None,
+                "rolling_e1rm": None,
+                "session_date": None,
+                "session_best_e1rm": 0.0,
+                "last_amap": None,
+            }
+        entry["sets"] += 1
+
+        if entry["best"] is None or e1rm > entry["best"]["e1rm"]:
+            entry["best"] = {"date": date, "weight": weight, "reps": reps, "e1rm": e1rm}
+
+        # Only a session's best set counts toward the rolling e1RM, so warm-up
+        # sets don't drag it down; it's folded in once the next session starts.
+        if date != entry["session_date"]:
+            if entry["session_date"] is not None:
+                entry["rolling_e1rm"] = self._rolled(entry)
+            entry["session_date"] = date
+            entry["session_best_e1rm"] = e1rm
+        else:
+            entry["session_best_e1rm"] = max(entry["session_best_e1rm"], e1rm)
+
+        if amap is not None:
+            entry["last_amap"] = amap
+
+    def _rolled(self, entry):
+        """Rolling e1RM including the current (still open) session. Sessions
+        without an e1RM (only 0 rep or very high rep sets) leave it as is."""
+        if not entry["session_best_e1rm"]:
+            return entry["rolling_e1rm"]
+        if entry["rolling_e1rm"] is None:
+            return entry["session_best_e1rm"]
+        return (
+            self.alpha * entry["session_best_e1rm"]
+            + (1 - self.alpha) * entry["rolling_e1rm"]
+        )
+
+    def rolling_e1rm(self, entry):
+        """Return the entry's rolling e1RM, counting its latest session."""
+        if entry["session_date"] is None:
+            return None
+        return self._rolled(entry)
+
+
+@functools.lru_cache(maxsize=1024)
+def _lift_key(name):
+    """Normalize a lift name: Juggernaut lifts by enum name (e.g. "BENCH"),
+    anything else lowercased, so accessory lifts are tracked too."""
+    try:
+        return parse_lift(name).name
+    except ValueError:
+        return name.strip().lower()
+
+
+def _complete_lines(f, source):
+    """Yield decoded complete lines from binary file f, stopping before a
+    trailing partial line. source["offset"] is the start of the line last
+    yielded until the next one is requested, & then moves past it."""
+    for raw in f:
+        if not raw.endswith(b"\n"):
+            break
+        yield raw.decode()
+        source["offset"] += len(raw)
+
+
+def ingest(state, path):
+    """Read new lines of the log at path into state.
+
+    Returns (sets ingested, [(location, error)] for skipped rows). Raises
+    ValueError if the log shrank since it was last read.
+    """
+    source_key = str(path.resolve())
+    source = state.sources.setdefault(source_key, {"offset": 0, "header": None})
+    if path.stat().st_size < source["offset"]:
+        raise ValueError(
+            f"{path} is smaller than when last read; rebuild the state file"
+        )
+
+    is_csv = path.suffix.lower() == ".csv"
+    added = 0
+    skipped = []
+    with open(path, "rb") as f:
+        f.seek(source["offset"])
+        lines = _complete_lines(f, source)
+        if is_csv:
+            # Rows can't span lines, which log exports don't need anyway
+            rows = csv.reader(lines)
+            if source["header"] is None:
+                source["header"] = next(rows, None)
+            records = (dict(zip(source["header"], row)) for row in rows if row)
+        else:
+            records = (line for line in lines if line.strip())
+
+        for record in records:
+            try:
+                if not is_csv:
+                    record = json.loads(record)
+                state.add_set(record)
+            except KeyError as e:
+                skipped.append((f"byte {source['offset']}", f"missing {e.args[0]!r}"))
+            except (TypeError, ValueError) as e:
+                skipped.append((f"byte {source['offset']}", e))
+            else:
+                added += 1
+    return added, skipped
+
+
+def lift_summaries(state):
+    """Return one dict per athlete × lift summarizing its e1RM history."""
+    summaries = []
+    for entry in state.lifts.values():
+        rolling = state.rolling_e1rm(entry)
+        best = entry["best"]
+        amap = entry["last_amap"]
+        summaries.append(
+            {
+                "athlete": entry["athlete"],
+                "lift": entry["lift"].lower(),
+                "sets": entry["sets"],
+                "last_session": entry["session_date"],
+                "rolling_e1rm": None if rolling is None else round(rolling, 2),
+                "best_e1rm": round(best["e1rm"], 2),
+                "best_set": f"{best['weight']:g} x {best['reps']} ({best['date']})",
+                "last_amap": None
+                if amap is None
+                else f"{amap['weight']:g} x {amap['reps']} ({amap['date']})",
+            }
+        )
+    return sorted(summaries, key=lambda s: (s["athlete"], s["lift"]))
+
+
+def working_max_rows(state, default_standard_reps):
+    """Turn each Juggernaut lift's latest AMAP set into a row for
+    `juggernaut.batch_new_working_maxes()`.
+
+    Returns (rows, [reason] for athlete × lifts that were left out).
+    """
+    rows = []
+    left_out = []
+    for entry in state.lifts.values():
+        name = f"{entry['athlete']} {entry['lift'].lower()}"
+        try:
+            lift = parse_lift(entry["lift"])
+        except ValueError:
+            continue  # not a Juggernaut lift
+        amap = entry["last_amap"]
+        if amap is None:
+            left_out.append(f"{name}: no AMAP set logged")
+            continue
+        if amap["working_max"] is None:
+            left_out.append(f"{name}: no working_max on its last AMAP set")
+            continue
+        if amap["reps"] > REP_TABLE_MAX:
+            left_out.append(
+                f"{name}: more than {REP_TABLE_MAX} reps on its last AMAP set"
+            )
+            continue
+        standard_reps = amap["standard_reps"]
+        rows.append(
+            {
+                "athlete": entry["athlete"],
+                "lift": lift,
+                "standard_reps": default_standard_reps
+                if standard_reps is None
+                else standard_reps,
+                "working_max": amap["working_max"],
+                "reps_performed": amap["reps"],
+                "last_set_weight": amap["weight"],
+            }
+        )
+    rows.sort(key=lambda row: (row["athlete"], row["lift"].value))
+    return rows, left_out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ingest workout logs into e1RM history & feed it to juggernaut.py."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="Read new sets from logs into the state file"
+    )
+    ingest_parser.add_argument("logs", nargs="+", type=Path, help=".csv or .jsonl logs")
+    ingest_parser.add_argument(
+        "-f",
+        "--formula",
+        choices=ESTIMATORS,
+        default=DEFAULT_FORMULA,
+        help=f"1RM formula, for a new state file (default: {DEFAULT_FORMULA})",
+    )
+    ingest_parser.add_argument(
+        "--alpha",
+        type=float,
+        default=DEFAULT_ALPHA,
+        help=f"Rolling e1RM weight of the newest session, for a new state file (default: {DEFAULT_ALPHA})",
+    )
+
+    show_parser = subparsers.add_parser("show", help="Print e1RM history")
+    maxes_parser = subparsers.add_parser(
+        "maxes", help="Calculate new working maxes from the latest AMAP sets"
+    )
+    maxes_parser.add_argument(
+        "--standard-reps",
+        type=int,
+        default=5,
+        help="Standard reps for AMAP sets without a standard_reps value (default: 5)",
+    )
+    for subparser in [ingest_parser, show_parser, maxes_parser]:
+        subparser.add_argument(
+            "-s",
+            "--state",
+            type=Path,
+            required=True,
+            help="State file, created by `ingest` if missing",
+        )
+    for subparser in [show_parser, maxes_parser]:
+        subparser.add_argument(
+            "-o",
+            "--output",
+            type=Path,
+            help="Write to this .csv or .json file instead of printing",
+        )
+
+    args = parser.parse_args()
+    if args.command == "ingest" and not 0 < args.alpha <= 1:
+        parser.error("--alpha must be in (0, 1]")
+
+    if args.state.exists():
+        try:
+            state = LogState.load(args.state)
+        except (ValueError, KeyError) as e:
+            print(f"Error: could not load {args.state}: {e}")
+            sys.exit(1)
+    elif args.command == "ingest":
+        state = LogState(args.formula, args.alpha)
+    else:
+        print(f"Error: {args.state} doesn't exist; run `ingest` first")
+        sys.exit(1)
+
+    if args.command == "ingest":
+        total_skipped = 0
+        for path in args.logs:
+            try:
+                added, skipped = ingest(state, path)
+            except (OSError, ValueError) as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            finally:
+                state.save(args.state)
+            print(f"{path}: ingested {added} set(s)")
+            for where, error in skipped[:5]:
+                print(f"  skipped row at {where}: {error}")
+            if len(skipped) > 5:
+                print(f"  ... & {len(skipped) - 5} more")
+            total_skipped += len(skipped)
+        print(f"Tracking {len(state.lifts)} athlete × lift(s) in {args.state}")
+        if total_skipped:
+            sys.exit(1)
+        return
+
+    if args.command == "show":
+        records = lift_summaries(state)
+    else:
+        rows, left_out = working_max_rows(state, args.standard_reps)
+        for reason in left_out:
+            print(f"Skipping {reason}")
+        if not rows:
+            print("Error: no AMAP sets with a working max to calculate from")
+            sys.exit(1)
+        try:
+            results = batch_new_working_maxes(
+                [row["lift"].value for row in rows],
+                [row["standard_reps"] for row in rows],
+                [row["working_max"] for row in rows],
+                [row["reps_performed"] for row in rows],
+                [row["last_set_weight"] for row in rows],
+                state.formula,
+            )
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        records = batch_results_to_records(rows, results)
+
+    if not records:
+        print("Nothing ingested yet")
+    elif args.output is None:
+        print_records(records)
+    else:
+        write_records(records, args.output)
+        print(f"Wrote {len(records)} row(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
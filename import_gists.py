@@ -8,6 +8,13 @@ Requires: git-filter-repo, `brew install git-filter-repo`.
 
 Usage:
     python import_gists.py <gists_to_import.txt>
+    python import_gists.py --jobs 8 <gists_to_import.txt>
+    python import_gists.py --engine fast-import <gists_to_import.txt>
+    python import_gists.py --plan <gists_to_import.txt>
+    python import_gists.py --batch-size 50 <gists_to_import.txt>
+    python import_gists.py --report report.json <gists_to_import.txt>
+    python import_gists.py --finalize <gists_to_import.txt>
+    python import_gists.py --url-template 'file:///path/{gist_id}.git' <gists_to_import.txt>
 
 gists_to_import.txt format:
   - one gist per line: <filename> <gist_id>
@@ -20,16 +27,78 @@ Example:
     precise_race_splits.py 22532b2e0b6a7ce1c481d2dda65c82e6
 
 Must be run from inside the target git repo.
+
+With `--jobs N`, cloning, validating, & rewriting gists happens in a pool of N
+worker processes, while merges into the target repo stay serialized & in input
+order, so the resulting history is the same as a serial run.
+
+With `--engine fast-import`, each gist is still cloned & validated, but instead
+of a git-filter-repo rewrite plus `git remote add/fetch/merge/remote remove` per
+gist, every gist's rewritten history & its merge commit are streamed into this
+repo through a single `git fast-import` session.
+
+Progress is checkpointed to a state file (default `import_gists_state.json`
+in the repo's git directory, as given by `git rev-parse --git-path`, so
+worktrees & submodules work too) recording each imported gist's upstream head,
+imported head, & merge commit. Rerunning after a failure skips gists that are
+already merged into the current branch & picks up where the last run stopped.
+
+With `--sync`, already-imported gists aren't skipped outright: their upstream
+heads are checked with concurrent `git ls-remote` calls, & only gists with new
+commits are fetched, with just those commits rewritten & streamed (through the
+fast-import engine) on top of the previously imported history.
+
+With `--cache-dir DIR`, gists are kept as bare mirrors in DIR (keyed by gist
+ID) across runs. Each run only fetches new objects into the mirror & clones
+from it locally. Mirrors unused for `--cache-max-age` days, & the least
+recently used mirrors beyond `--cache-max-size` MB, are evicted at the end of
+each run.
+
+With `--batch-size N` (N > 1), rewritten gists are fetched into temporary refs
+& merged N at a time: each batch's combined tree is built with plumbing
+(`read-tree`/`write-tree`) in a temporary index & committed as a single octopus
+merge with `commit-tree`, so the working tree is only checked out once, at the
+end.
+
+Each gist's phases (validate, clone, rewrite, merge) are timed, along with
+the wall time & count of git subprocesses, bytes received (where git reports
+them), & commits rewritten. A timing summary is printed at the end of the run,
+& `--report FILE` also writes everything as JSON.
+
+Gists are cloned from `git@gist.github.com:<gist_id>.git` by default; pass
+e.g. `--url-template 'file:///path/{gist_id}.git'` to import from elsewhere,
+such as the synthetic gists made by `import_gists_bench.py`.
+
+Every fetch or fast-import session leaves another small pack in this repo.
+With `--finalize`, the repo is repacked into a single pack at the end of the
+run, & a commit-graph & multi-pack-index are written, so `git log` & `blame`
+are fast straight away; object & pack counts from before & after are printed
+(& included in the `--report`).
+
+With `--plan`, nothing is cloned or changed: the input file is parsed &
+deduplicated, the repo & state file are checked, & what would be imported is
+printed. git-filter-repo is only loaded once there's something to rewrite, so
+`--plan` (& usage errors) start fast & work without it installed.
 """
 
+import argparse
+import atexit
+import contextlib
+import contextvars
 import datetime
+import functools
 import importlib.machinery
 import importlib.util
+import io
+import json
 import os
+import re
+import shlex
 import shutil
 import subprocess
 import sys
 import tempfile
+import time
 from pathlib import Path
 
 
@@ -59,8 +128,9 @@ def _colors():
 C = _colors()
 
 
+@functools.cache
 def _load_git_filter_repo():
-    """Import git-filter-repo from brew installation."""
+    """Import git-filter-repo from brew installation, on first use."""
     path = shutil.which("git-filter-repo")
     if not path:
         sys.exit(
@@ -74,40 +144,343 @@ def _load_git_filter_repo():
     return module
 
 
-git_filter_repo = _load_git_filter_repo()
-
 SCRIPT_NAME = "import_gists.py"
 REPO_URL = "https://github.com/izzygomez/gists"
 
+# `git ls-remote` calls are tiny & network-bound, so run plenty at once
+LS_REMOTE_JOBS = 16
+
+# Where gists are cloned from; overridden by --url-template
+GIST_URL_TEMPLATE = "git@gist.github.com:{gist_id}.git"
+
 
 class CommandError(Exception):
-    """Raised when a shell command fails."""
+    """Raised when a git (or other) command fails."""
+
+
+class GistStats:
+    """Timing & transfer stats for importing one gist, for the run report."""
+
+    def __init__(self):
+        self.phases = {}
+        self.subprocess_seconds = 0.0
+        self.subprocess_count = 0
+        self.bytes_received = 0
+        self.commits = 0
+
+    def add(self, other):
+        """Fold in stats collected elsewhere, e.g. in a worker process."""
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.subprocess_seconds += other.subprocess_seconds
+        self.subprocess_count += other.subprocess_count
+        self.bytes_received += other.bytes_received
+        self.commits += other.commits
+
+    def to_dict(self):
+        return {
+            "phases": {name: round(secs, 6) for name, secs in self.phases.items()},
+            "subprocess_seconds": round(self.subprocess_seconds, 6),
+            "subprocess_count": self.subprocess_count,
+            "bytes_received": self.bytes_received,
+            "commits": self.commits,
+        }
+
+
+# Stats of the gist currently being imported in this thread/process, if any
+_current_stats = contextvars.ContextVar("current_stats", default=None)
+
+# Final line of git's --progress output for a transfer, e.g.
+# "Receiving objects: 100% (9/9), 1.21 KiB | 1.21 MiB/s, done."
+RECEIVED_RE = re.compile(
+    r"Receiving objects: 100% \([^)]*\), ([\d.]+) (bytes|KiB|MiB|GiB)"
+)
+BYTE_UNITS = {"bytes": 1, "KiB": 1024, "MiB": 1024**2, "GiB": 1024**3}
+
+
+def _record_subprocess(seconds, stderr=""):
+    """Add a finished subprocess to the current gist's stats, if any."""
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    stats.subprocess_seconds += seconds
+    stats.subprocess_count += 1
+    received = RECEIVED_RE.findall(stderr)
+    if received:
+        amount, unit = received[-1]
+        stats.bytes_received += int(float(amount) * BYTE_UNITS[unit])
+
+
+@contextlib.contextmanager
+def _phase(name):
+    """Time a phase of the current gist's import, if stats are being kept."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current_stats.get()
+        if stats is not None:
+            elapsed = time.perf_counter() - start
+            stats.phases[name] = stats.phases.get(name, 0.0) + elapsed
+
 
+def run(cmd, cwd=None, env=None, input=None, check=True):
+    """Run a command, given as an argument list (no shell), & return output.
 
-def run(cmd, cwd=None):
-    """Run a shell command & return output. Raises CommandError on failure."""
+    Raises CommandError on failure, unless `check` is false.
+    """
+    cmd = [os.fspath(arg) for arg in cmd]
+    start = time.perf_counter()
     result = subprocess.run(
         cmd,
-        shell=True,
         cwd=cwd,
+        env=env,
+        input=input,
         capture_output=True,
         text=True,
+        check=False,
     )
-    if result.returncode != 0:
-        raise CommandError(f"Command failed: {cmd}\n{result.stderr}")
+    _record_subprocess(time.perf_counter() - start, result.stderr)
+    if check and result.returncode != 0:
+        raise CommandError(f"Command failed: {shlex.join(cmd)}\n{result.stderr}")
     return result
 
 
-def get_gist_branch(gist_dir):
-    """Determine if gist uses 'main' or 'master' branch."""
-    result = run("git branch --show-current", cwd=gist_dir)
-    return result.stdout.strip()
+def show_cmd(cmd, indent="    "):
+    """Print a command the way it could be pasted into a shell."""
+    print(f"{indent}{C['dim']}{shlex.join(os.fspath(arg) for arg in cmd)}{C['reset']}")
+
+
+class RevResolver:
+    """Resolves revisions in one repo through a long-lived
+    `git cat-file --batch-check`, instead of spawning `git rev-parse` for each.
+
+    Refs & objects written by other git commands after it starts are still
+    seen: cat-file rereads loose refs on every lookup & rescans packs on a miss.
+    """
+
+    def __init__(self, repo_dir):
+        self.proc = subprocess.Popen(
+            ["git", "cat-file", "--batch-check=%(objectname)"],
+            cwd=repo_dir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+
+    def resolve(self, rev):
+        """Return the object name rev points to. Raises CommandError if it
+        doesn't exist."""
+        if "\n" in rev:
+            raise CommandError(f"Invalid revision: {rev!r}")
+        self.proc.stdin.write(rev + "\n")
+        self.proc.stdin.flush()
+        line = self.proc.stdout.readline().strip()
+        # Unknown revisions come back as "<rev> missing" (or "ambiguous")
+        if not re.fullmatch(r"[0-9a-f]{40}|[0-9a-f]{64}", line):
+            raise CommandError(f"Could not resolve {rev}")
+        return line
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+@functools.cache
+def _rev_resolver(repo_dir):
+    resolver = RevResolver(repo_dir)
+    atexit.register(resolver.close)
+    return resolver
+
+
+def rev_parse(rev, repo_dir):
+    """Resolve rev in repo_dir, via a RevResolver shared by all callers."""
+    return _rev_resolver(repo_dir).resolve(rev)
+
+
+def gist_url(gist_id):
+    """Return the URL to clone a gist from."""
+    return GIST_URL_TEMPLATE.format(gist_id=gist_id)
+
+
+def _set_gist_url_template(url_template):
+    """Set GIST_URL_TEMPLATE, including in worker processes (which don't
+    inherit module globals set after import when using spawn)."""
+    global GIST_URL_TEMPLATE
+    GIST_URL_TEMPLATE = url_template
+
+
+def get_remote_head(gist_id):
+    """Return the commit the gist's remote HEAD points to, without cloning."""
+    result = run(["git", "ls-remote", gist_url(gist_id), "HEAD"])
+    if not result.stdout.strip():
+        raise CommandError(f"Could not find remote HEAD for {gist_url(gist_id)}")
+    return result.stdout.split()[0]
+
+
+def find_updated_gists(gists, state):
+    """Check imported gists for upstream changes with concurrent ls-remotes.
+
+    Returns ({gist_id: (old_head, imported_head)} for gists with new commits,
+    [error message] for gists that couldn't be checked).
+    """
+    # Imported here rather than at the top to keep `--plan` startup fast
+    from concurrent.futures import ThreadPoolExecutor
+
+    updates = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=LS_REMOTE_JOBS) as pool:
+        futures = [pool.submit(get_remote_head, gist_id) for _, gist_id in gists]
+        for (filename, gist_id), future in zip(gists, futures):
+            try:
+                remote_head = future.result()
+            except CommandError as e:
+                errors.append(f"{filename} ({gist_id}): {e}")
+                continue
+            entry = state.gists[gist_id]
+            if remote_head != entry["head"]:
+                updates[gist_id] = (entry["head"], entry["imported_head"])
+    return updates, errors
+
+
+def update_cached_mirror(gist_id, cache_dir):
+    """Create or update the cached bare mirror of a gist. Returns its path."""
+    mirror_dir = cache_dir / f"{gist_id}.git"
+    if mirror_dir.exists():
+        mirror_cmd = ["git", "-C", mirror_dir, "fetch", "--progress", "--prune"]
+    else:
+        mirror_cmd = ["git", "clone", "--progress", "--mirror"]
+        mirror_cmd += [gist_url(gist_id), mirror_dir]
+    show_cmd(mirror_cmd)
+    run(mirror_cmd)
+    os.utime(mirror_dir)  # mark as recently used, for eviction
+    return mirror_dir
+
+
+def _dir_size(path):
+    return sum(
+        (Path(root) / name).stat().st_size
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def evict_cached_mirrors(cache_dir, max_age_days, max_size_mb):
+    """Remove cached mirrors older than max_age_days, then remove the least
+    recently used mirrors until the cache fits in max_size_mb.
+
+    Returns the number of mirrors removed.
+    """
+    if not cache_dir.exists():
+        return 0
+    mirrors = sorted(
+        (path for path in cache_dir.glob("*.git") if path.is_dir()),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    cutoff = time.time() - max_age_days * 24 * 60 * 60
+    max_size = max_size_mb * 1024 * 1024
+    total_size = 0
+    removed = 0
+    for mirror_dir in mirrors:
+        size = _dir_size(mirror_dir)
+        if mirror_dir.stat().st_mtime < cutoff or total_size + size > max_size:
+            shutil.rmtree(mirror_dir)
+            removed += 1
+        else:
+            total_size += size
+    return removed
+
+
+def validate_gist_files(filename, gist_dir):
+    """Check the gist's head tree holds exactly one file, named filename.
+
+    Only reads the tree, so works on bare & blobless clones. Raises
+    CommandError if validation fails.
+    """
+    result = run(["git", "ls-tree", "-z", "--name-only", "HEAD"], cwd=gist_dir)
+    gist_files = [name for name in result.stdout.split("\0") if name]
+    if len(gist_files) == 0:
+        raise CommandError("Gist contains no files")
+    if len(gist_files) > 1:
+        raise CommandError(
+            f"Gist contains multiple files ({', '.join(gist_files)}). "
+            "Only single-file gists are supported."
+        )
+    actual_filename = gist_files[0]
+    if actual_filename != filename:
+        raise CommandError(
+            f"Filename mismatch: expected '{filename}', but gist contains '{actual_filename}'"
+        )
+
+
+def get_gist_head(gist_dir):
+    """Return the gist's branch ('main' or 'master') & head commit, with a
+    single `git rev-parse`."""
+    result = run(["git", "rev-parse", "HEAD", "--abbrev-ref", "HEAD"], cwd=gist_dir)
+    head, branch = result.stdout.split()
+    return branch, head
+
+
+class ImportState:
+    """On-disk record of imported gists, used to resume interrupted imports.
+
+    Maps each gist ID to its filename, upstream head, imported (rewritten)
+    head, & merge commit in this repo. Saved atomically after every change.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, gists=None):
+        self.path = path
+        self.gists = gists or {}
+
+    @classmethod
+    def load(cls, path, repo_dir):
+        """Load state from path, dropping gists whose merge commit is no longer
+        on the current branch (e.g. after a `git reset`)."""
+        if not path.exists():
+            return cls(path)
+        data = json.loads(path.read_text())
+        if data.get("version") != cls.VERSION:
+            raise CommandError(f"Unsupported state file version in {path}")
+        merges = set(
+            run(
+                ["git", "rev-list", "--first-parent", "--merges", "HEAD"], cwd=repo_dir
+            ).stdout.split()
+        )
+        gists = {
+            gist_id: entry
+            for gist_id, entry in data["gists"].items()
+            if entry["merge"] in merges
+        }
+        return cls(path, gists)
+
+    def is_done(self, gist_id):
+        return gist_id in self.gists
+
+    def record(self, gist_id, filename, head, imported_head, merge):
+        self.gists[gist_id] = {
+            "filename": filename,
+            "head": head,
+            "imported_head": imported_head,
+            "merge": merge,
+        }
+
+    def save(self):
+        data = {"version": self.VERSION, "gists": self.gists}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+        os.replace(tmp_path, self.path)
 
 
 def make_commit_callback(filename, gist_id):
     """Create a commit message rewriter for the given filename."""
 
     def rewrite_commit(commit, _metadata):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.commits += 1
         parts = commit.author_date.split()
         timestamp = int(parts[0])
         tz = parts[1].decode() if isinstance(parts[1], bytes) else parts[1]
@@ -126,84 +499,607 @@ def make_commit_callback(filename, gist_id):
     return rewrite_commit
 
 
-def import_gist(filename, gist_id, repo_dir, temp_dir):
-    """Import a single gist into the repo.
+def prepare_gist(filename, gist_id, gist_dir, rewrite=True, cache_dir=None):
+    """Clone, validate, & (if `rewrite`) rewrite a single gist into gist_dir.
 
-    Returns None on success, or an error message string on failure.
-    """
-    print(
-        f"\n{C['bold']}{C['cyan']}>>> Importing {filename}{C['reset']} {C['dim']}(from gist.github.com/{gist_id}){C['reset']}"
-    )
+    If `cache_dir` is given, the gist is cloned from an up-to-date cached
+    mirror there rather than straight from gist.github.com.
 
-    gist_dir = temp_dir / f"gist-{gist_id}"
+    Never changes the working directory, so it's safe to run from a worker
+    process. Returns the gist's branch name & (pre-rewrite) head commit. Raises
+    CommandError on failure.
+    """
+    ### Validate gist contents before pulling its full history
+    print(f"    {C['yellow']}Checking gist contents...{C['reset']}")
+    mirror_dir = cache_dir / f"{gist_id}.git" if cache_dir is not None else None
+    create_mirror = mirror_dir is not None and not mirror_dir.exists()
+    with _phase("validate"):
+        if mirror_dir is not None and not create_mirror:
+            # An existing mirror is cheap to update, & then validated locally
+            clone_url = update_cached_mirror(gist_id, cache_dir)
+            validate_gist_files(filename, mirror_dir)
+        else:
+            # Otherwise inspect the head tree via a shallow, blobless clone
+            probe_dir = gist_dir.with_name(f"{gist_dir.name}-probe")
+            probe_cmd = ["git", "clone", "--progress", "--bare", "--depth", "1"]
+            probe_cmd += ["--filter=blob:none", gist_url(gist_id), probe_dir]
+            show_cmd(probe_cmd)
+            run(probe_cmd)
+            validate_gist_files(filename, probe_dir)
+            shutil.rmtree(probe_dir)
+            clone_url = gist_url(gist_id)
+    print(f"    {C['dim']}Verified: gist only contains '{filename}'{C['reset']}")
 
-    try:
-        ### Clone the gist
+    ### Clone the gist
+    with _phase("clone"):
+        if create_mirror:
+            print(f"    {C['yellow']}Creating cached mirror...{C['reset']}")
+            clone_url = update_cached_mirror(gist_id, cache_dir)
         print(f"    {C['yellow']}Cloning gist into temp dir...{C['reset']}")
-        clone_cmd = f"git clone git@gist.github.com:{gist_id}.git {gist_dir}"
-        print(f"    {C['dim']}{clone_cmd}{C['reset']}")
+        clone_cmd = ["git", "clone", "--progress", os.fspath(clone_url), gist_dir]
+        show_cmd(clone_cmd)
         run(clone_cmd)
 
-        ### Validate gist contents
-        # Get all files in gist (excluding .git directory)
-        gist_files = [f.name for f in gist_dir.iterdir() if f.is_file()]
-        if len(gist_files) == 0:
-            raise CommandError("Gist contains no files")
-        if len(gist_files) > 1:
-            raise CommandError(
-                f"Gist contains multiple files ({', '.join(gist_files)}). "
-                "Only single-file gists are supported."
-            )
-        actual_filename = gist_files[0]
-        if actual_filename != filename:
-            raise CommandError(
-                f"Filename mismatch: expected '{filename}', but gist contains '{actual_filename}'"
-            )
-        print(f"    {C['dim']}Verified: gist only contains '{filename}'{C['reset']}")
-
         # Get branch name (master or main)
-        branch = get_gist_branch(gist_dir)
-        print(f"    {C['dim']}Branch: {branch}{C['reset']}")
+        branch, head = get_gist_head(gist_dir)
+    print(f"    {C['dim']}Branch: {branch} ({head}){C['reset']}")
 
-        ### Rewrite commit messages using git-filter-repo as a library
-        print(
-            f"    {C['yellow']}Rewriting commit messages using git-filter-repo...{C['reset']}"
-        )
+    if not rewrite:
+        return branch, head
+
+    ### Rewrite commit messages using git-filter-repo as a library
+    print(
+        f"    {C['yellow']}Rewriting commit messages using git-filter-repo...{C['reset']}"
+    )
+    with _phase("rewrite"):
+        git_filter_repo = _load_git_filter_repo()
         print(C["dim"], end="")  # dim any output from git-filter-repo
-        args = git_filter_repo.FilteringOptions.parse_args(["--force", "--quiet"])
+        # Point filter-repo at the gist with --source/--target rather than
+        # chdir-ing into it, since the working directory is process-global.
+        args = git_filter_repo.FilteringOptions.parse_args(
+            ["--force", "--quiet", "--source", str(gist_dir), "--target", str(gist_dir)]
+        )
         repo_filter = git_filter_repo.RepoFilter(
             args,
             commit_callback=make_commit_callback(filename, gist_id),
         )
-        # filter-repo needs to run from within the repo
-        original_dir = Path.cwd()
+        repo_filter.run()
+        print(C["reset"], end="")  # reset after git-filter-repo output
+
+    return branch, head
+
+
+def _prepare_gist_job(filename, gist_id, gist_dir, rewrite=True, cache_dir=None):
+    """Worker process entry point for `prepare_gist()`.
+
+    git-filter-repo keeps module-level state, so rewrites run in separate
+    processes rather than threads. Output & stats are captured so the parent
+    can print & report them in input order. Returns
+    (output, (branch, head), error, stats).
+    """
+    output = io.StringIO()
+    stats = GistStats()
+    _current_stats.set(stats)
+    with contextlib.redirect_stdout(output):
         try:
-            os.chdir(gist_dir)
-            repo_filter.run()
+            prepared = prepare_gist(filename, gist_id, gist_dir, rewrite, cache_dir)
+        except CommandError as e:
+            return output.getvalue(), None, e, stats
+    return output.getvalue(), prepared, None, stats
+
+
+def merge_gist(filename, gist_id, gist_dir, branch, repo_dir):
+    """Merge an already-rewritten gist into the repo at repo_dir."""
+    print(f"    {C['yellow']}Merging into this repo...{C['reset']}")
+    print(f"    {C['dim']}Running these commands inside {repo_dir}:{C['reset']}")
+    remote_name = f"temp-{gist_id[:8]}"
+
+    add_remote_cmd = ["git", "remote", "add", remote_name, gist_dir]
+    show_cmd(add_remote_cmd)
+    run(add_remote_cmd, cwd=repo_dir)
+
+    fetch_cmd = ["git", "fetch", remote_name]
+    show_cmd(fetch_cmd)
+    run(fetch_cmd, cwd=repo_dir)
+
+    merge_cmd = [
+        "git",
+        "merge",
+        f"{remote_name}/{branch}",
+        "--allow-unrelated-histories",
+        "-m",
+        f"merge '{filename}' from https://gist.github.com/{gist_id}",
+    ]
+    show_cmd(merge_cmd)
+    run(merge_cmd, cwd=repo_dir)
+
+    remove_remote_cmd = ["git", "remote", "remove", remote_name]
+    show_cmd(remove_remote_cmd)
+    run(remove_remote_cmd, cwd=repo_dir)
+
+
+class OctopusMerger:
+    """Merges rewritten gists in batches, with one octopus merge per batch.
+
+    Each gist is fetched into a temporary ref & its tree is added to a
+    temporary index with `read-tree --prefix=`, which refuses to overwrite
+    existing paths just like an unrelated-histories merge would conflict.
+    Every `batch_size` gists, the index is written out & committed with all
+    of the batch's gists as extra parents, & the branch is moved forward.
+
+    The working tree is only updated once, when the merger finishes or is
+    aborted. Use as a context manager, like `FastImportEngine`.
+    """
+
+    # Gists are rewritten with git-filter-repo before `add_gist()`
+    rewrite_first = True
+
+    def __init__(self, repo_dir, batch_size, state=None):
+        self.repo_dir = repo_dir
+        self.batch_size = batch_size
+        self.state = state
+        # (gist_id, filename, head, imported_head) per gist in current batch
+        self.batch = []
+        self.branch_ref = run(
+            ["git", "symbolic-ref", "HEAD"], cwd=repo_dir
+        ).stdout.strip()
+        self.orig_head = rev_parse("HEAD", repo_dir)
+        self.head = self.orig_head
+
+        index_fd, self.index_path = tempfile.mkstemp(suffix=".index")
+        os.close(index_fd)
+        os.remove(self.index_path)  # read-tree wants to create it
+        self.env = {**os.environ, "GIT_INDEX_FILE": self.index_path}
+        run(["git", "read-tree", self.head], cwd=repo_dir, env=self.env)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+
+    def add_gist(self, filename, gist_id, gist_dir, branch, head, base=None):
+        """Fetch a rewritten gist & add its tree to the current batch."""
+        if base is not None:
+            raise CommandError("Syncing gists needs the fast-import engine")
+
+        print(f"    {C['yellow']}Adding to merge batch...{C['reset']}")
+        temp_ref = f"refs/import-gists/{gist_id}"
+        fetch_cmd = ["git", "fetch", "--no-tags", gist_dir]
+        fetch_cmd += [f"+refs/heads/{branch}:{temp_ref}"]
+        show_cmd(fetch_cmd)
+        run(fetch_cmd, cwd=self.repo_dir)
+        imported_head = rev_parse(temp_ref, self.repo_dir)
+
+        read_tree_cmd = ["git", "read-tree", "--prefix=", imported_head]
+        show_cmd(read_tree_cmd)
+        try:
+            run(read_tree_cmd, cwd=self.repo_dir, env=self.env)
+        except CommandError:
+            raise CommandError(f"'{filename}' already exists in this repo") from None
+
+        self.batch.append((gist_id, filename, head, imported_head))
+        if len(self.batch) >= self.batch_size:
+            self._commit_batch()
+
+    def _commit_batch(self):
+        """Commit the current batch as one merge & move the branch to it."""
+        if not self.batch:
+            return
+        lines = [
+            f"merge '{filename}' from https://gist.github.com/{gist_id}"
+            for gist_id, filename, _, _ in self.batch
+        ]
+        if len(lines) == 1:
+            message = lines[0] + "\n"
+        else:
+            message = f"merge {len(lines)} gists\n\n" + "\n".join(lines) + "\n"
+
+        print(
+            f"\n{C['yellow']}Committing merge of {len(self.batch)} gist(s)...{C['reset']}"
+        )
+        tree = run(
+            ["git", "write-tree"], cwd=self.repo_dir, env=self.env
+        ).stdout.strip()
+        commit_cmd = ["git", "commit-tree", tree]
+        for parent in [self.head] + [entry[3] for entry in self.batch]:
+            commit_cmd += ["-p", parent]
+        commit = run(
+            commit_cmd + ["-F", "-"], cwd=self.repo_dir, input=message
+        ).stdout.strip()
+        update_ref_cmd = ["git", "update-ref", self.branch_ref, commit, self.head]
+        show_cmd(update_ref_cmd, indent="")
+        run(update_ref_cmd, cwd=self.repo_dir)
+        self.head = commit
+
+        if self.state is not None:
+            for gist_id, filename, head, imported_head in self.batch:
+                self.state.record(gist_id, filename, head, imported_head, commit)
+            self.state.save()
+        self.batch = []
+
+    def finish(self):
+        """Commit the last (partial) batch & check out the new branch tip."""
+        try:
+            self._commit_batch()
         finally:
-            os.chdir(original_dir)
-        print(C["reset"], end="")  # reset after git-filter-repo output
+            self.abort()
 
-        ### Merge into main repo
-        print(f"    {C['yellow']}Merging into this repo...{C['reset']}")
-        print(f"    {C['dim']}Running these commands inside {repo_dir}:{C['reset']}")
-        remote_name = f"temp-{gist_id[:8]}"
+    def abort(self):
+        """Drop any uncommitted batch & check out whatever was committed."""
+        temp_refs = run(
+            ["git", "for-each-ref", "--format=delete %(refname)", "refs/import-gists/"],
+            cwd=self.repo_dir,
+        ).stdout
+        if temp_refs:
+            run(["git", "update-ref", "--stdin"], cwd=self.repo_dir, input=temp_refs)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        print(f"\n{C['yellow']}Updating working tree...{C['reset']}")
+        read_tree_cmd = ["git", "read-tree", "-m", "-u", self.orig_head, self.head]
+        show_cmd(read_tree_cmd, indent="")
+        run(read_tree_cmd, cwd=self.repo_dir)
 
-        add_remote_cmd = f"git remote add {remote_name} {gist_dir}"
-        print(f"    {C['dim']}{add_remote_cmd}{C['reset']}")
-        run(add_remote_cmd, cwd=repo_dir)
 
-        fetch_cmd = f"git fetch {remote_name}"
-        print(f"    {C['dim']}{fetch_cmd}{C['reset']}")
-        run(fetch_cmd, cwd=repo_dir)
+class FastImportEngine:
+    """Streams rewritten gist histories into the repo via one `git fast-import`.
+
+    Each gist's history is read with `git fast-export`, has its commit messages
+    rewritten by `make_commit_callback()`, & is followed by a merge commit onto
+    the current branch, all written to a single fast-import process. The
+    branch ref & working tree are only updated by `finish()`, which also
+    records the imported gists in `state`, if given.
+
+    Use as a context manager: the session is finished on a clean exit, &
+    aborted (leaving the repo untouched) if an exception escapes.
+    """
+
+    # Gists are rewritten as they're streamed, not with git-filter-repo
+    rewrite_first = False
+
+    def __init__(self, repo_dir, state=None):
+        self.repo_dir = repo_dir
+        self.state = state
+        # (gist_id, filename, head, imported_head_mark, merge_mark) per gist
+        self.imported = []
+        self.branch_ref = run(
+            ["git", "symbolic-ref", "HEAD"], cwd=repo_dir
+        ).stdout.strip()
+        self.orig_head = rev_parse("HEAD", repo_dir)
+        # Either a commit hash (bytes) or a fast-import mark (int)
+        self.head = self.orig_head.encode()
+        self.paths = set(
+            run(["git", "ls-tree", "-r", "-z", "--name-only", "HEAD"], cwd=repo_dir)
+            .stdout.strip("\0")
+            .split("\0")
+        )
+
+        # Merge commits are authored & committed by the user, like `git merge`
+        ident = run(["git", "var", "GIT_COMMITTER_IDENT"], cwd=repo_dir).stdout.strip()
+        match = re.fullmatch(r"(.*) <(.*)> (\d+ [+-]\d{4})", ident)
+        if not match:
+            raise CommandError(f"Could not parse committer identity: {ident}")
+        self.ident = tuple(part.encode() for part in match.groups())
+
+        # --done makes fast-import discard everything (& leave refs alone) if
+        # the stream ends without an explicit `done`, i.e. if we abort.
+        marks_fd, self.marks_path = tempfile.mkstemp(suffix=".marks")
+        os.close(marks_fd)
+        self.fast_import = subprocess.Popen(
+            [
+                "git",
+                "-c",
+                "core.ignorecase=false",
+                "fast-import",
+                "--quiet",
+                "--done",
+                f"--export-marks={self.marks_path}",
+            ],
+            cwd=repo_dir,
+            stdin=subprocess.PIPE,
+        )
 
-        merge_cmd = f"git merge {remote_name}/{branch} --allow-unrelated-histories -m \"merge '{filename}' from https://gist.github.com/{gist_id}\""
-        print(f"    {C['dim']}{merge_cmd}{C['reset']}")
-        run(merge_cmd, cwd=repo_dir)
+    def __enter__(self):
+        return self
 
-        remove_remote_cmd = f"git remote remove {remote_name}"
-        print(f"    {C['dim']}{remove_remote_cmd}{C['reset']}")
-        run(remove_remote_cmd, cwd=repo_dir)
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+
+    def add_gist(self, filename, gist_id, gist_dir, branch, head, base=None):
+        """Stream one gist's rewritten history & its merge commit.
+
+        If `base` is given, it's the (old_head, imported_head) pair of a
+        previous import, & only commits after old_head are rewritten, on top of
+        imported_head.
+
+        The gist is exported into a buffer first so a failed export never
+        leaves a partial history in the fast-import stream.
+        """
+        if base is None:
+            if filename in self.paths:
+                raise CommandError(f"'{filename}' already exists in this repo")
+            revs = f"refs/heads/{branch}"
+            parent_map = {}
+            merge_msg = f"merge '{filename}' from https://gist.github.com/{gist_id}\n"
+        else:
+            old_head, imported_head = base
+            self._check_updatable(filename, gist_dir, branch, old_head, imported_head)
+            revs = f"{old_head}..refs/heads/{branch}"
+            parent_map = {old_head.encode(): imported_head.encode()}
+            merge_msg = (
+                f"merge updates to '{filename}' from "
+                f"https://gist.github.com/{gist_id}\n"
+            )
+
+        print(f"    {C['yellow']}Streaming into fast-import...{C['reset']}")
+        branch_ref = self.branch_ref.encode()
+        tip = {}
+
+        def rewrite_commit(commit, metadata):
+            commit_callback(commit, metadata)
+            commit.branch = branch_ref
+            # Parents outside the exported range are raw hashes; point them at
+            # the previously imported (rewritten) history.
+            commit.parents = [parent_map.get(p, p) for p in commit.parents]
+            tip["id"] = commit.id
+
+        def retarget_reset(reset):
+            reset.ref = branch_ref
+
+        commit_callback = make_commit_callback(filename, gist_id)
+        export_cmd = [
+            "git",
+            "-C",
+            str(gist_dir),
+            "fast-export",
+            "--show-original-ids",
+            "--signed-tags=strip",
+            "--tag-of-filtered-object=rewrite",
+            "--fake-missing-tagger",
+            "--reference-excluded-parents",
+            revs,
+        ]
+        show_cmd(export_cmd)
+        git_filter_repo = _load_git_filter_repo()
+        start = time.perf_counter()
+        export = subprocess.Popen(export_cmd, stdout=subprocess.PIPE)
+        stream = io.BytesIO()
+        parser = git_filter_repo.FastExportParser(
+            commit_callback=rewrite_commit, reset_callback=retarget_reset
+        )
+        parser.run(export.stdout, stream)
+        export.stdout.close()
+        returncode = export.wait()
+        _record_subprocess(time.perf_counter() - start)
+        if returncode != 0:
+            raise CommandError(f"Command failed: {shlex.join(export_cmd)}")
+        if "id" not in tip:
+            raise CommandError("Gist has no new commits")
+
+        # The merge commit's tree is this repo's tree plus the gist's file,
+        # which is exactly what `git merge --allow-unrelated-histories` yields.
+        path = gist_dir / filename
+        blob = git_filter_repo.Blob(path.read_bytes())
+        mode = b"100755" if os.access(path, os.X_OK) else b"100644"
+        name, email, date = self.ident
+        merge = git_filter_repo.Commit(
+            branch_ref,
+            name,
+            email,
+            date,
+            name,
+            email,
+            date,
+            merge_msg.encode(),
+            [git_filter_repo.FileChange(b"M", filename.encode(), blob.id, mode)],
+            [self.head, tip["id"]],
+        )
+        blob.dump(stream)
+        merge.dump(stream)
+
+        self.fast_import.stdin.write(stream.getbuffer())
+        self.head = merge.id
+        self.paths.add(filename)
+        self.imported.append((gist_id, filename, head, tip["id"], merge.id))
+
+    def _check_updatable(self, filename, gist_dir, branch, old_head, imported_head):
+        """Raise CommandError unless new gist commits can go on top of an import.
+
+        Upstream history must only have moved forward, & the file must be
+        untouched in this repo since it was imported, since the merge commit
+        takes the gist's version of it.
+        """
+        try:
+            run(["git", "merge-base", "--is-ancestor", old_head, branch], cwd=gist_dir)
+        except CommandError:
+            raise CommandError(
+                "Gist history was rewritten upstream; re-import it instead"
+            ) from None
+        try:
+            ours = rev_parse(f"{self.orig_head}:{filename}", self.repo_dir)
+            imported = rev_parse(f"{imported_head}:{filename}", self.repo_dir)
+        except CommandError:
+            ours, imported = None, None
+        if ours is None or ours != imported:
+            raise CommandError(
+                f"'{filename}' was changed or moved in this repo since it was "
+                "imported; merge the gist's updates manually"
+            )
+
+    def finish(self):
+        """Close the fast-import stream, then check out the new branch tip."""
+        self.fast_import.stdin.write(b"done\n")
+        self.fast_import.stdin.close()
+        if self.fast_import.wait() != 0:
+            raise CommandError("git fast-import failed; see above")
+
+        marks = {}
+        with open(self.marks_path) as f:
+            for line in f:
+                mark, sha = line.split()
+                marks[int(mark[1:])] = sha
+        os.remove(self.marks_path)
+        if self.state is not None and self.imported:
+            for gist_id, filename, head, tip_mark, merge_mark in self.imported:
+                self.state.record(
+                    gist_id, filename, head, marks[tip_mark], marks[merge_mark]
+                )
+            self.state.save()
+
+        print(f"\n{C['yellow']}Updating working tree...{C['reset']}")
+        read_tree_cmd = ["git", "read-tree", "-m", "-u", self.orig_head, "HEAD"]
+        show_cmd(read_tree_cmd, indent="")
+        run(read_tree_cmd, cwd=self.repo_dir)
+
+    def abort(self):
+        """Kill fast-import without a `done`, so no refs are updated."""
+        self.fast_import.kill()
+        self.fast_import.wait()
+        os.remove(self.marks_path)
+
+
+def parse_gists_file(input_file):
+    """Parse `<filename> <gist_id>` lines, skipping blanks & # comments.
+
+    Repeated gist IDs are dropped, keeping the first occurrence. Returns
+    (gists, duplicate lines). Raises ValueError on a malformed line.
+    """
+    gists = {}
+    duplicates = []
+    for line in input_file.read_text().strip().split("\n"):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        if len(parts) != 2:
+            raise ValueError(f"Invalid line: {line}")
+        filename, gist_id = parts
+        if gist_id in gists:
+            duplicates.append(line)
+        else:
+            gists[gist_id] = filename
+    return [(filename, gist_id) for gist_id, filename in gists.items()], duplicates
+
+
+def print_plan(gists, repo_dir, state_path):
+    """Print what an import of gists would do, without changing anything."""
+    result = run(
+        ["git", "rev-parse", "--verify", "--quiet", "HEAD"], cwd=repo_dir, check=False
+    )
+    has_commits = result.returncode == 0
+    if has_commits:
+        branch = run(
+            ["git", "symbolic-ref", "--short", "-q", "HEAD"], cwd=repo_dir, check=False
+        )
+        branch = branch.stdout.strip() or "(detached HEAD)"
+        print(f"{C['dim']}Repo: {repo_dir} on {branch}{C['reset']}")
+        paths = set(
+            run(["git", "ls-tree", "-r", "-z", "--name-only", "HEAD"], cwd=repo_dir)
+            .stdout.strip("\0")
+            .split("\0")
+        )
+        state = ImportState.load(state_path, repo_dir)
+    else:
+        print(
+            f"{C['dim']}Repo: {repo_dir} has no commits; an empty initial "
+            f"commit would be created{C['reset']}"
+        )
+        paths = set()
+        state = ImportState(state_path)
+
+    counts = {"import": 0, "skip": 0, "conflict": 0}
+    for filename, gist_id in gists:
+        if state.is_done(gist_id):
+            action = "skip"
+            note = f"already imported in {state.gists[gist_id]['merge'][:7]}"
+            color = C["dim"]
+        elif filename in paths:
+            action = "conflict"
+            note = f"'{filename}' already exists in this repo"
+            color = C["red"]
+        else:
+            action = "import"
+            note = ""
+            color = C["green"]
+            paths.add(filename)
+        counts[action] += 1
+        print(f"    {color}{action:<8}{C['reset']} {filename} ({gist_id}) {note}")
+
+    print(
+        f"\n{C['bold']}>>> Plan: {counts['import']} to import, "
+        f"{counts['skip']} already imported, {counts['conflict']} conflict(s)."
+        f"{C['reset']}"
+    )
+
+
+def import_gist(
+    filename,
+    gist_id,
+    repo_dir,
+    temp_dir,
+    prepared=None,
+    engine=None,
+    state=None,
+    base=None,
+    cache_dir=None,
+    stats=None,
+):
+    """Import a single gist into the repo.
+
+    If `prepared` is given, it's a future for a `_prepare_gist_job()` already
+    submitted to a worker pool, & only the merge happens here. If `engine` is
+    given (a `FastImportEngine` or `OctopusMerger`), the gist is handed to it
+    instead of being merged with `git merge`. If `state` is given, a merged
+    gist is recorded & checkpointed to disk (the engine records its own gists).
+    If `base` is given, only the gist's new commits since a previous import are
+    streamed; see `FastImportEngine.add_gist()`. If `cache_dir` is given, the
+    gist is cloned via a cached mirror; see `prepare_gist()`. If `stats` (a
+    `GistStats`) is given, the import's phases & subprocesses are recorded in it.
+
+    Returns None on success, or an error message string on failure.
+    """
+    action = "Importing" if base is None else "Syncing"
+    print(
+        f"\n{C['bold']}{C['cyan']}>>> {action} {filename}{C['reset']} {C['dim']}(from gist.github.com/{gist_id}){C['reset']}"
+    )
+
+    gist_dir = temp_dir / f"gist-{gist_id}"
+    stats_token = _current_stats.set(stats)
+
+    try:
+        if prepared is None:
+            branch, head = prepare_gist(
+                filename,
+                gist_id,
+                gist_dir,
+                engine is None or engine.rewrite_first,
+                cache_dir,
+            )
+        else:
+            output, result, error, worker_stats = prepared.result()
+            if stats is not None:
+                stats.add(worker_stats)
+            print(output, end="")
+            if error:
+                raise error
+            branch, head = result
+
+        with _phase("merge"):
+            if engine is None:
+                merge_gist(filename, gist_id, gist_dir, branch, repo_dir)
+                if state is not None:
+                    merge = rev_parse("HEAD", repo_dir)
+                    imported_head = rev_parse("HEAD^2", repo_dir)
+                    state.record(gist_id, filename, head, imported_head, merge)
+                    state.save()
+            else:
+                engine.add_gist(filename, gist_id, gist_dir, branch, head, base)
 
         print(f"    {C['green']}Done with {filename}{C['reset']}")
         return None
@@ -212,13 +1108,210 @@ def import_gist(filename, gist_id, repo_dir, temp_dir):
         print(f"    {C['red']}Failed: {e}{C['reset']}")
         return f"{filename} ({gist_id}): {e}"
 
+    finally:
+        _current_stats.reset(stats_token)
+
+
+PHASES = ["validate", "clone", "rewrite", "merge"]
+
+
+def count_objects(repo_dir):
+    """Return `git count-objects -v` as a dict, e.g. {"count": loose objects,
+    "in-pack": packed objects, "packs": packs, "size-pack": KiB, ...}."""
+    result = run(["git", "count-objects", "-v"], cwd=repo_dir)
+    counts = {}
+    for line in result.stdout.splitlines():
+        key, value = line.split(": ")
+        counts[key] = int(value)
+    return counts
+
+
+def finalize_repo(repo_dir):
+    """Repack the repo into a single pack & write a commit-graph &
+    multi-pack-index, so it's fast to query right after an import.
+
+    Returns `count_objects()` from before & after.
+    """
+    before = count_objects(repo_dir)
+    for cmd in [
+        # -a -d: all reachable objects into one new pack, dropping the
+        # per-gist packs & any loose objects it now contains
+        ["git", "repack", "-a", "-d", "-q"],
+        ["git", "commit-graph", "write", "--reachable"],
+        ["git", "multi-pack-index", "write"],
+    ]:
+        show_cmd(cmd)
+        run(cmd, cwd=repo_dir)
+    return before, count_objects(repo_dir)
+
+
+def print_finalize_summary(before, after, seconds):
+    """Print object & pack counts from before & after `finalize_repo()`."""
+
+    def describe(counts):
+        return (
+            f"{counts['count']} loose + {counts['in-pack']} packed objects in "
+            f"{counts['packs']} pack(s) ({counts['size-pack']} KiB)"
+        )
+
+    print(f"    {C['dim']}before: {describe(before)}{C['reset']}")
+    print(f"    {C['dim']}after:  {describe(after)} in {seconds:.2f}s{C['reset']}")
+
+
+def print_timing_summary(results, wall_seconds):
+    """Print a per-phase timing table & throughput for the processed gists.
+
+    results is a list of (filename, gist_id, error, stats), one per gist.
+    """
+    all_stats = [stats for _, _, _, stats in results]
+    print(f"\n{C['bold']}>>> Timing summary{C['reset']}")
+    print(f"    {'phase':<10} {'total':>9} {'mean':>9} {'max':>9}")
+    for name in PHASES:
+        times = [stats.phases[name] for stats in all_stats if name in stats.phases]
+        if not times:
+            continue
+        print(
+            f"    {name:<10} {sum(times):>8.2f}s {sum(times) / len(times):>8.2f}s "
+            f"{max(times):>8.2f}s"
+        )
+    subprocess_count = sum(stats.subprocess_count for stats in all_stats)
+    subprocess_seconds = sum(stats.subprocess_seconds for stats in all_stats)
+    bytes_received = sum(stats.bytes_received for stats in all_stats)
+    commits = sum(stats.commits for stats in all_stats)
+    print(
+        f"    {C['dim']}{subprocess_count} git subprocesses "
+        f"({subprocess_seconds:.2f}s), {bytes_received / 1024:.1f} KiB received, "
+        f"{commits} commits rewritten{C['reset']}"
+    )
+    print(
+        f"    {C['dim']}{wall_seconds:.2f}s wall: "
+        f"{len(all_stats) / wall_seconds:.2f} gists/s, "
+        f"{commits / wall_seconds:.2f} commits/s{C['reset']}"
+    )
+
+
+def write_report(path, args, results, started, wall_seconds, finalize=None):
+    """Write a JSON report of the run, with per-gist stats.
+
+    results is a list of (filename, gist_id, error, stats), one per gist.
+    finalize, if given, is a dict describing the `--finalize` stage.
+    """
+    entries = []
+    totals = GistStats()
+    for filename, gist_id, error, stats in results:
+        entry = {
+            "filename": filename,
+            "gist_id": gist_id,
+            "status": "failed" if error else "imported",
+        }
+        if error:
+            entry["error"] = error
+        entry.update(stats.to_dict())
+        entries.append(entry)
+        totals.add(stats)
+    report = {
+        "started": started.isoformat(),
+        "engine": args.engine,
+        "jobs": args.jobs,
+        "batch_size": args.batch_size,
+        "wall_seconds": round(wall_seconds, 6),
+        "gists_per_second": len(results) / wall_seconds if wall_seconds else None,
+        "commits_per_second": totals.commits / wall_seconds if wall_seconds else None,
+        "totals": totals.to_dict(),
+        "gists": entries,
+    }
+    if finalize is not None:
+        report["finalize"] = finalize
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
 
 def main():
-    if len(sys.argv) != 2:
-        print(f"{C['red']}Usage:{C['reset']} `{SCRIPT_NAME} <input_file>`")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Import single-file GitHub Gists into this git repo, preserving commit history."
+    )
+    parser.add_argument(
+        "input_file", type=Path, help="File of `<filename> <gist_id>` lines"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of gists to clone & rewrite in parallel (default: 1)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["merge", "fast-import"],
+        default="merge",
+        help="Merge each gist with `git merge` (default), or stream all gists through one `git fast-import`",
+    )
+    parser.add_argument(
+        "--state",
+        type=Path,
+        help="State file used to resume interrupted imports (default: import_gists_state.json in the repo's git directory)",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Also pull new upstream commits into already-imported gists (implies --engine fast-import)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Merge gists N at a time as octopus merges built with plumbing (default: 1, i.e. one `git merge` per gist)",
+    )
+    parser.add_argument(
+        "--url-template",
+        default=GIST_URL_TEMPLATE,
+        help=f"URL to clone each gist from, with a {{gist_id}} placeholder (default: {GIST_URL_TEMPLATE})",
+    )
+    parser.add_argument(
+        "--finalize",
+        action="store_true",
+        help="After importing, repack into a single pack & write a commit-graph & multi-pack-index",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        help="Write per-gist phase timings & transfer stats to this JSON file",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only print what would be imported; clones & changes nothing",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Directory of bare gist mirrors to reuse across runs (default: no cache)",
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=float,
+        default=30,
+        help="Evict cached mirrors unused for this many days (default: 30)",
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        type=float,
+        default=1024,
+        help="Evict least recently used cached mirrors beyond this many MB (default: 1024)",
+    )
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.sync:
+        args.engine = "fast-import"
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.batch_size > 1 and args.engine != "merge":
+        parser.error("--batch-size only applies to --engine merge")
+    if "{gist_id}" not in args.url_template:
+        parser.error("--url-template must contain {gist_id}")
+    _set_gist_url_template(args.url_template)
 
-    input_file = Path(sys.argv[1])
+    input_file = args.input_file
     if not input_file.exists():
         print(f"{C['red']}Error:{C['reset']} Input file not found: {input_file}")
         sys.exit(1)
@@ -227,44 +1320,189 @@ def main():
     if not (repo_dir / ".git").exists():
         print(f"{C['red']}Error:{C['reset']} must be run from inside a git repo")
         sys.exit(1)
+    if args.state is None:
+        # .git is a file in worktrees & submodules, so ask git where it is
+        args.state = Path(
+            run(
+                ["git", "rev-parse", "--git-path", "import_gists_state.json"],
+                cwd=repo_dir,
+            ).stdout.strip()
+        )
+
+    # Parse input file
+    try:
+        gists, duplicates = parse_gists_file(input_file)
+    except ValueError as e:
+        print(f"{C['red']}Error:{C['reset']} {e}")
+        sys.exit(1)
+
+    print(f"{C['cyan']}Found {len(gists)} gists to import{C['reset']}")
+    for line in duplicates:
+        print(f"{C['yellow']}Skipping duplicate gist:{C['reset']} {line}")
+
+    if args.plan:
+        try:
+            print_plan(gists, repo_dir, repo_dir / args.state)
+        except (CommandError, ValueError, KeyError) as e:
+            print(f"{C['red']}Error:{C['reset']} {e}")
+            sys.exit(1)
+        return
 
     # Create empty initial commit if repo has no commits. This is needed for
     # first merge to work as expected.
-    result = subprocess.run(
-        "git rev-parse HEAD",
-        shell=True,
-        cwd=repo_dir,
-        capture_output=True,
+    result = run(
+        ["git", "rev-parse", "--verify", "--quiet", "HEAD"], cwd=repo_dir, check=False
     )
     if result.returncode != 0:
         print(f"{C['yellow']}Creating empty initial commit...{C['reset']}")
-        run('git commit --allow-empty -m "empty initial commit"', cwd=repo_dir)
+        run(
+            ["git", "commit", "--allow-empty", "-m", "empty initial commit"],
+            cwd=repo_dir,
+        )
 
-    # Parse input file
-    gists = []
-    for line in input_file.read_text().strip().split("\n"):
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        parts = line.split()
-        if len(parts) != 2:
-            print(f"{C['red']}Error:{C['reset']} Invalid line: {line}")
-            sys.exit(1)
-        gists.append((parts[0], parts[1]))
+    # Skip gists already imported by a previous (possibly interrupted) run
+    try:
+        state = ImportState.load(repo_dir / args.state, repo_dir)
+    except (CommandError, ValueError, KeyError) as e:
+        print(f"{C['red']}Error:{C['reset']} Could not load {args.state}: {e}")
+        sys.exit(1)
+    imported = [gist for gist in gists if state.is_done(gist[1])]
+    updates, check_errors = {}, []
+    if imported and args.sync:
+        print(
+            f"{C['dim']}Checking {len(imported)} imported gist(s) for upstream "
+            f"changes...{C['reset']}"
+        )
+        updates, check_errors = find_updated_gists(imported, state)
+    skipped = len(imported) - len(updates)
+    if skipped:
+        print(
+            f"{C['dim']}Skipping {skipped} gist(s) already "
+            f"{'up to date' if args.sync else 'imported'} according to "
+            f"{args.state}{C['reset']}"
+        )
+    gists = [gist for gist in gists if not state.is_done(gist[1]) or gist[1] in updates]
 
-    print(f"{C['cyan']}Found {len(gists)} gists to import{C['reset']}")
+    # Only now that there's something to rewrite is git-filter-repo needed;
+    # load it up front so a missing install fails once, not once per gist.
+    if gists:
+        _load_git_filter_repo()
+
+    engine = None
+    try:
+        if args.engine == "fast-import":
+            engine = FastImportEngine(repo_dir, state)
+        elif args.batch_size > 1:
+            engine = OctopusMerger(repo_dir, args.batch_size, state)
+    except CommandError as e:
+        print(f"{C['red']}Error:{C['reset']} {e}")
+        sys.exit(1)
+
+    cache_dir = None
+    if args.cache_dir:
+        cache_dir = args.cache_dir.resolve()
+        cache_dir.mkdir(parents=True, exist_ok=True)
 
     # Create temp directory & import each gist
     errors = []
-    with tempfile.TemporaryDirectory() as temp_dir:
+    results = []  # (filename, gist_id, error, stats) per gist, for the report
+    # Not datetime.UTC, which is 3.11+; the scripts still support 3.10
+    started = datetime.datetime.now(datetime.timezone.utc)
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as temp_dir, engine or contextlib.nullcontext():
         temp_path = Path(temp_dir)
-        for filename, gist_id in gists:
-            error = import_gist(filename, gist_id, repo_dir, temp_path)
-            if error:
-                errors.append(error)
+        if args.jobs == 1:
+            for filename, gist_id in gists:
+                stats = GistStats()
+                error = import_gist(
+                    filename,
+                    gist_id,
+                    repo_dir,
+                    temp_path,
+                    engine=engine,
+                    state=state,
+                    base=updates.get(gist_id),
+                    cache_dir=cache_dir,
+                    stats=stats,
+                )
+                results.append((filename, gist_id, error, stats))
+                if error:
+                    errors.append(error)
+        else:
+            # Imported here rather than at the top to keep `--plan` startup fast
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Clone & rewrite in workers, but merge serially in input order
+            with ProcessPoolExecutor(
+                max_workers=args.jobs,
+                initializer=_set_gist_url_template,
+                initargs=(args.url_template,),
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        _prepare_gist_job,
+                        filename,
+                        gist_id,
+                        temp_path / f"gist-{gist_id}",
+                        engine is None or engine.rewrite_first,
+                        cache_dir,
+                    )
+                    for filename, gist_id in gists
+                ]
+                for (filename, gist_id), future in zip(gists, futures):
+                    stats = GistStats()
+                    error = import_gist(
+                        filename,
+                        gist_id,
+                        repo_dir,
+                        temp_path,
+                        prepared=future,
+                        engine=engine,
+                        state=state,
+                        base=updates.get(gist_id),
+                        cache_dir=cache_dir,
+                        stats=stats,
+                    )
+                    results.append((filename, gist_id, error, stats))
+                    if error:
+                        errors.append(error)
+
+    wall_seconds = time.perf_counter() - start
+
+    if cache_dir:
+        evicted = evict_cached_mirrors(
+            cache_dir, args.cache_max_age, args.cache_max_size
+        )
+        if evicted:
+            print(f"{C['dim']}Evicted {evicted} cached mirror(s){C['reset']}")
+
+    if results:
+        print_timing_summary(results, wall_seconds)
+
+    finalize = None
+    if args.finalize:
+        print(f"\n{C['bold']}>>> Finalizing repo{C['reset']}")
+        finalize_start = time.perf_counter()
+        try:
+            before, after = finalize_repo(repo_dir)
+        except CommandError as e:
+            check_errors.append(f"finalize: {e}")
+        else:
+            finalize_seconds = time.perf_counter() - finalize_start
+            print_finalize_summary(before, after, finalize_seconds)
+            finalize = {
+                "seconds": round(finalize_seconds, 6),
+                "before": before,
+                "after": after,
+            }
+
+    if args.report:
+        write_report(args.report, args, results, started, wall_seconds, finalize)
+        print(f"{C['dim']}Wrote run report to {args.report}{C['reset']}")
 
     # Print summary
     succeeded = len(gists) - len(errors)
+    errors = check_errors + errors
     if errors:
         print(
             f"\n{C['bold']}{C['red']}>>> Finished with {len(errors)} error(s):{C['reset']}"
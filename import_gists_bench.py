@@ -0,0 +1,260 @@
+"""
+import_gists_bench.py
+
+Offline benchmark for import_gists.py: generates synthetic gists as local bare
+repos, then imports them into a scratch repo & reports throughput, with no
+network access or GitHub account needed.
+
+Usage:
+    python import_gists_bench.py generate <dir> --gists 200 --commits 20 --file-size 4096
+    python import_gists_bench.py run <dir>
+    python import_gists_bench.py run <dir> --repeat 3 -- --jobs 8 --engine fast-import
+
+`generate` creates <dir>/gists/<gist_id>.git, one bare repo per gist, each with
+a single file changed in every commit (built in one `git fast-import` session
+per gist, so large sets are quick to make), plus <dir>/gists_to_import.txt
+listing them. Content is derived from --seed, so the same arguments always
+produce the same gists.
+
+`run` imports <dir>/gists_to_import.txt into a fresh repo under a temporary
+directory, passing `--url-template file://<dir>/gists/{gist_id}.git` & any
+arguments after `--` through to import_gists.py. It reads back the
+`--report` JSON of each run & prints gists/sec & commits/sec, with the median
+across `--repeat` runs. With `--min-gists-per-second`, it exits non-zero if
+the median falls below that, for use as a regression check.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+
+def _colors():
+    if sys.stdout.isatty():
+        return {
+            "bold": "\033[1m",
+            "dim": "\033[2m",
+            "red": "\033[31m",
+            "green": "\033[32m",
+            "yellow": "\033[33m",
+            "cyan": "\033[36m",
+            "reset": "\033[0m",
+        }
+    return {
+        "bold": "",
+        "dim": "",
+        "red": "",
+        "green": "",
+        "yellow": "",
+        "cyan": "",
+        "reset": "",
+    }
+
+
+C = _colors()
+
+IMPORTER = Path(__file__).resolve().parent / "import_gists.py"
+LIST_NAME = "gists_to_import.txt"
+
+# Fixed dates keep generated repos byte-for-byte reproducible
+BASE_TIMESTAMP = 1_600_000_000
+
+
+def gist_id_for(index, seed):
+    """Return a 32-hex-digit ID, like a real gist's, for the index'th gist."""
+    return hashlib.md5(f"{seed}:{index}".encode()).hexdigest()
+
+
+def fast_import_stream(filename, commits, file_size, rng):
+    """Return a fast-import stream of `commits` commits, each rewriting
+    `filename` with `file_size` bytes of fresh text & an empty message, as
+    gist commits have."""
+    out = []
+    for n in range(commits):
+        # Hex keeps the content text, so the importer treats it like a real gist
+        content = rng.randbytes((file_size + 1) // 2).hex()[:file_size] + "\n"
+        data = content.encode()
+        when = BASE_TIMESTAMP + n * 3600
+        out.append(b"commit refs/heads/main\n")
+        out.append(f"mark :{n + 1}\n".encode())
+        out.append(f"committer Bench <bench@example.com> {when} +0000\n".encode())
+        out.append(b"data 0\n")
+        if n:
+            out.append(f"from :{n}\n".encode())
+        out.append(f"M 100644 inline {filename}\n".encode())
+        out.append(f"data {len(data)}\n".encode() + data + b"\n")
+    out.append(b"done\n")
+    return b"".join(out)
+
+
+def generate(out_dir, gists, commits, file_size, seed):
+    """Create `gists` bare gist repos under out_dir/gists & the list file."""
+    gists_dir = out_dir / "gists"
+    gists_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    lines = []
+    for index in range(gists):
+        gist_id = gist_id_for(index, seed)
+        filename = f"bench-{index:05d}.txt"
+        repo = gists_dir / f"{gist_id}.git"
+        if repo.exists():
+            print(f"{C['yellow']}Warning:{C['reset']} {repo} already exists, skipping")
+            # Keep the RNG in step so the remaining gists match a fresh run
+            for _ in range(commits):
+                rng.randbytes((file_size + 1) // 2)
+        else:
+            subprocess.run(
+                ["git", "init", "-q", "--bare", "-b", "main", str(repo)], check=True
+            )
+            # Lets the importer's blobless probe clone work as it does on GitHub
+            subprocess.run(
+                ["git", "-C", str(repo), "config", "uploadpack.allowFilter", "true"],
+                check=True,
+            )
+            subprocess.run(
+                ["git", "-C", str(repo), "fast-import", "--quiet", "--done"],
+                input=fast_import_stream(filename, commits, file_size, rng),
+                check=True,
+            )
+        lines.append(f"{filename} {gist_id}\n")
+    (out_dir / LIST_NAME).write_text("".join(lines))
+    print(
+        f"{C['green']}Generated {gists} gists x {commits} commits x "
+        f"{file_size} bytes in {gists_dir}{C['reset']}"
+    )
+
+
+def run_once(bench_dir, importer_args):
+    """Import the generated gists into a fresh scratch repo & return the
+    parsed --report JSON."""
+    url_template = (bench_dir / "gists").resolve().as_uri() + "/{gist_id}.git"
+    with tempfile.TemporaryDirectory(prefix="import_gists_bench_") as tmp:
+        repo = Path(tmp) / "repo"
+        report = Path(tmp) / "report.json"
+        subprocess.run(["git", "init", "-q", str(repo)], check=True)
+        # So merges can be committed on machines with no git identity set up
+        for key, value in [("user.name", "Bench"), ("user.email", "bench@example.com")]:
+            subprocess.run(["git", "-C", str(repo), "config", key, value], check=True)
+        cmd = [
+            sys.executable,
+            str(IMPORTER),
+            "--url-template",
+            url_template,
+            "--report",
+            str(report),
+            *importer_args,
+            str((bench_dir / LIST_NAME).resolve()),
+        ]
+        print(f"{C['cyan']}Running: {shlex.join(cmd)}{C['reset']}")
+        result = subprocess.run(
+            cmd, cwd=repo, capture_output=True, text=True, check=False
+        )
+        if result.returncode != 0:
+            print(result.stdout, end="")
+            print(result.stderr, end="", file=sys.stderr)
+            sys.exit(f"{C['red']}Error:{C['reset']} import_gists.py failed")
+        return json.loads(report.read_text())
+
+
+def run(bench_dir, repeat, importer_args, min_gists_per_second):
+    """Run the importer `repeat` times & print throughput."""
+    if not (bench_dir / LIST_NAME).exists():
+        sys.exit(
+            f"{C['red']}Error:{C['reset']} No {LIST_NAME} in {bench_dir}; run `generate` first"
+        )
+    gists_rates = []
+    commits_rates = []
+    for n in range(repeat):
+        report = run_once(bench_dir, importer_args)
+        failed = [g for g in report["gists"] if g["status"] == "failed"]
+        if failed:
+            sys.exit(
+                f"{C['red']}Error:{C['reset']} {len(failed)} gist(s) failed to import, "
+                f"e.g. {failed[0]['gist_id']}: {failed[0]['error']}"
+            )
+        gists_rates.append(report["gists_per_second"])
+        commits_rates.append(report["commits_per_second"])
+        print(
+            f"  run {n + 1}/{repeat}: {len(report['gists'])} gists, "
+            f"{report['totals']['commits']} commits in {report['wall_seconds']:.2f}s "
+            f"({report['gists_per_second']:.2f} gists/s, "
+            f"{report['commits_per_second']:.1f} commits/s)"
+        )
+
+    median_gists = statistics.median(gists_rates)
+    median_commits = statistics.median(commits_rates)
+    print(
+        f"\n{C['bold']}Median of {repeat} run(s): {median_gists:.2f} gists/s, "
+        f"{median_commits:.1f} commits/s{C['reset']}"
+    )
+    if min_gists_per_second is not None and median_gists < min_gists_per_second:
+        sys.exit(
+            f"{C['red']}Error:{C['reset']} Below --min-gists-per-second "
+            f"({median_gists:.2f} < {min_gists_per_second})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark import_gists.py against synthetic local gists."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gen = subparsers.add_parser("generate", help="Create synthetic bare gist repos")
+    gen.add_argument("dir", type=Path, help="Directory to create the gists in")
+    gen.add_argument(
+        "--gists", type=int, default=100, help="Number of gists (default: 100)"
+    )
+    gen.add_argument(
+        "--commits", type=int, default=10, help="Commits per gist (default: 10)"
+    )
+    gen.add_argument(
+        "--file-size",
+        type=int,
+        default=1024,
+        help="Size in bytes of each gist's file, per commit (default: 1024)",
+    )
+    gen.add_argument(
+        "--seed", type=int, default=0, help="Seed for IDs & content (default: 0)"
+    )
+
+    bench = subparsers.add_parser(
+        "run",
+        help="Import the generated gists & time it; arguments after `--` are passed to import_gists.py",
+    )
+    bench.add_argument("dir", type=Path, help="Directory passed to `generate`")
+    bench.add_argument(
+        "--repeat", type=int, default=1, help="Number of runs (default: 1)"
+    )
+    bench.add_argument(
+        "--min-gists-per-second",
+        type=float,
+        help="Exit non-zero if the median gists/sec is below this",
+    )
+
+    # Everything after `--` goes to import_gists.py untouched
+    argv = sys.argv[1:]
+    importer_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, importer_args = argv[:split], argv[split + 1 :]
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        if args.gists < 1 or args.commits < 1 or args.file_size < 0:
+            parser.error("--gists & --commits must be >= 1, --file-size >= 0")
+        generate(args.dir, args.gists, args.commits, args.file_size, args.seed)
+    else:
+        if args.repeat < 1:
+            parser.error("--repeat must be >= 1")
+        run(args.dir, args.repeat, importer_args, args.min_gists_per_second)
+
+
+if __name__ == "__main__":
+    main()